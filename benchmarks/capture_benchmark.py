@@ -0,0 +1,119 @@
+"""Capture time and memory per backend at common screen sizes.
+
+Runs every size under its own virtual framebuffer when Xvfb is installed:
+
+    python benchmarks/capture_benchmark.py --xvfb
+
+Without --xvfb only the current display is measured (plus the file backend
+at every size, which needs no display).
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image
+import capture
+
+SIZES = {
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+    "3x1080p": (5760, 1080),
+}
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux), 0 elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def measure(backend, repeat):
+    # First grab sets up buffers (shared memory segments etc), report it separately
+    before = rss_bytes()
+    start = time.perf_counter()
+    image = backend.grab()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image = backend.grab()
+        timings.append((time.perf_counter() - start) * 1000)
+    memory_mb = (rss_bytes() - before) / (1024 * 1024)
+
+    timings.sort()
+    return image.size, first_ms, timings[len(timings) // 2], memory_mb
+
+
+def report(label, backend, repeat):
+    size, first_ms, median_ms, memory_mb = measure(backend, repeat)
+    print(f"{label:<8} {backend.name:<7} {size[0]}x{size[1]:<6} first {first_ms:8.1f} ms  "
+          f"median {median_ms:8.1f} ms  rss +{memory_mb:7.1f} MB")
+
+
+def run_display(label, repeat):
+    for backend_class in (capture.XShmBackend, capture.PillowBackend):
+        if not backend_class.is_available():
+            continue
+        try:
+            backend = backend_class()
+        except Exception as e:
+            print(f"{label:<8} {backend_class.name:<7} unavailable: {e}")
+            continue
+        try:
+            report(label, backend, repeat)
+        except Exception as e:
+            print(f"{label:<8} {backend_class.name:<7} failed: {e}")
+        finally:
+            backend.close()
+
+
+def run_xvfb(label, size, repeat, display_number):
+    display = f":{display_number}"
+    server = subprocess.Popen(["Xvfb", display, "-screen", "0", f"{size[0]}x{size[1]}x24", "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1)
+        env = dict(os.environ, DISPLAY=display)
+        env.pop(capture.FileBackend.ENV_VAR, None)
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--label", label, "--repeat", str(repeat)],
+                       env=env, check=False)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--xvfb", action="store_true", help="start an Xvfb server per screen size")
+    parser.add_argument("--label", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process started under Xvfb: measure the display it was given
+    if args.label:
+        run_display(args.label, args.repeat)
+        return
+
+    for label, size in SIZES.items():
+        report(label, capture.FileBackend(Image.new("RGB", size, "white")), args.repeat)
+
+    if args.xvfb:
+        if not shutil.which("Xvfb"):
+            sys.exit("Xvfb not found")
+        for number, (label, size) in enumerate(SIZES.items(), start=99):
+            run_xvfb(label, size, args.repeat, number)
+    elif os.environ.get("DISPLAY") or sys.platform == "win32":
+        run_display("current", args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Throughput of one request per snip vs coalesced multi-image requests.
+
+Snips of small UI-label sized crops are submitted at a fixed rate to a local
+mock of an OpenAI-compatible server. The mock answers after a fixed round trip
+plus a per-image cost and only works on a few requests at a time, like a rate
+limited API or a local vision model. Each snip's image encodes its number, and
+the mock echoes it back, so a wrongly split response fails the run.
+
+    python benchmarks/coalesce_benchmark.py
+    python benchmarks/coalesce_benchmark.py --rates 2 10 --snips 40 --latency 0.8
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image, ImageStat
+from openai_client import OpenAICompatibleTranslator
+from scheduler import RequestScheduler
+from snip_coalescer import SnipCoalescer
+from translator import Translator
+
+
+def snip_image(number):
+    # The colour carries the snip number through JPEG encoding
+    return Image.new("RGB", (240, 48), ((number % 32) * 8, (number // 32) * 8, 128))
+
+
+def snip_number(data_url):
+    image = Image.open(io.BytesIO(base64.b64decode(data_url.split(",", 1)[1])))
+    red, green, _ = ImageStat.Stat(image).mean
+    return round(red / 8) + round(green / 8) * 32
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        content = request["messages"][-1]["content"]
+        numbers = [snip_number(part["image_url"]["url"]) for part in content if part["type"] == "image_url"]
+
+        with self.server.slots:
+            time.sleep(self.server.latency + self.server.per_image * len(numbers))
+        with self.server.lock:
+            self.server.requests += 1
+
+        paragraphs = [[{"text": f"snip {number}", "direction": "ltr"}] for number in numbers]
+        if "images" in request["response_format"]["json_schema"]["schema"]["properties"]:
+            answer = {"images": [{"index": i, "paragraphs": p} for i, p in enumerate(paragraphs, 1)]}
+        else:
+            answer = {"paragraphs": paragraphs[0]}
+
+        body = json.dumps({
+            "choices": [{"message": {"content": json.dumps(answer)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(latency, per_image, slots):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.latency = latency
+    server.per_image = per_image
+    server.slots = threading.Semaphore(slots)
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(mode, rate, count, translator, server):
+    scheduler = RequestScheduler()
+    if mode == "coalesced":
+        coalescer = SnipCoalescer(lambda: translator, scheduler)
+        submit = coalescer.submit
+    else:
+        submit = lambda image, lang: scheduler.submit(lambda: translator.translate_image_blocks(image, lang),
+                                                      RequestScheduler.INTERACTIVE)
+
+    Translator._response_cache.clear()
+    requests_before = server.requests
+    latencies = [None] * count
+    done = threading.Event()
+    remaining = [count]
+    errors = []
+    lock = threading.Lock()
+
+    def finished(number, submitted_at, future):
+        try:
+            text = future.result()[0]["text"]
+            if text != f"snip {number}":
+                errors.append(f"snip {number} got the result of {text}")
+        except Exception as e:
+            errors.append(f"snip {number} failed: {e}")
+        latencies[number] = time.perf_counter() - submitted_at
+        with lock:
+            remaining[0] -= 1
+            if not remaining[0]:
+                done.set()
+
+    start = time.perf_counter()
+    for number in range(count):
+        time.sleep(max(0, start + number / rate - time.perf_counter()))
+        submitted_at = time.perf_counter()
+        future = submit(snip_image(number), "English")
+        future.add_done_callback(lambda f, n=number, t=submitted_at: finished(n, t, f))
+    done.wait()
+    wall = time.perf_counter() - start
+    if errors:
+        raise SystemExit(f"{mode} at {rate}/s: {errors[0]}")
+
+    return {
+        "requests": server.requests - requests_before,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(count * 0.95) - 1] * 1000,
+        "throughput": count / wall
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 2, 5, 10, 20], help="snips per second")
+    parser.add_argument("--snips", type=int, default=20, help="snips per run")
+    parser.add_argument("--latency", type=float, default=0.4, help="mock round trip in seconds")
+    parser.add_argument("--per-image", type=float, default=0.02, help="mock cost per image in seconds")
+    parser.add_argument("--slots", type=int, default=2, help="requests the mock works on at once")
+    args = parser.parse_args()
+
+    server = start_mock_server(args.latency, args.per_image, args.slots)
+    translator = OpenAICompatibleTranslator(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", model="mock")
+
+    print(f"mock: {args.latency * 1000:.0f} ms + {args.per_image * 1000:.0f} ms/image, {args.slots} slots, "
+          f"{args.snips} snips per run")
+    print(f"{'rate/s':>6} {'mode':<10} {'requests':>8} {'mean':>9} {'p95':>9} {'snips/s':>8}")
+    for rate in args.rates:
+        for mode in ("direct", "coalesced"):
+            # Keep the pipeline's per-request logging out of the table
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run(mode, rate, args.snips, translator, server)
+            print(f"{rate:6g} {mode:<10} {result['requests']:8d} {result['mean_ms']:6.0f} ms {result['p95_ms']:6.0f} ms "
+                  f"{result['throughput']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
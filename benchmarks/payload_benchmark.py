@@ -0,0 +1,102 @@
+"""Peak memory and encode-to-send time of the request body for large crops.
+
+Compares the previous approach (getvalue, b64encode, decode, json.dumps of the
+whole payload) with the streamed body that requests reads in 8 KB blocks.
+Noise images are used as a worst case for JPEG size. "full" skips the usual
+downscale to MAX_DIMENSION to show how the body scales with upload size.
+
+    python benchmarks/payload_benchmark.py
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image
+from translator import EncodedImage, JSONStreamBody, Translator
+
+SIZES = {
+    "4K": (3840, 2160),
+    "8K": (7680, 4320),
+}
+
+# Same shape as a Gemini request, with the image data left out
+PAYLOAD_TEMPLATE = {
+    "contents": [{"parts": [{"inline_data": {"mime_type": "image/jpeg", "data": None}}]}],
+    "systemInstruction": {"parts": [{"text": Translator.SYSTEM_PROMPTS["text"]}]}
+}
+
+
+def prepare(image, resize):
+    if resize and max(image.size) > Translator.MAX_DIMENSION:
+        ratio = Translator.MAX_DIMENSION / max(image.size)
+        image = image.resize((int(image.width * ratio), int(image.height * ratio)), Image.Resampling.LANCZOS)
+    return image
+
+
+def legacy_body(image):
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=85)
+    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    payload = json.loads(json.dumps(PAYLOAD_TEMPLATE))
+    payload["contents"][0]["parts"][0]["inline_data"]["data"] = img_str
+    # What requests does with json=payload
+    body = json.dumps(payload).encode("utf-8")
+    return len(body)
+
+
+def streamed_body(image):
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=85)
+    encoded = EncodedImage(buffered)
+    payload = json.loads(json.dumps(PAYLOAD_TEMPLATE))
+    payload["contents"][0]["parts"][0]["inline_data"]["data"] = encoded.placeholder
+    body = JSONStreamBody(payload, [encoded])
+    # What http.client does when sending a file-like body
+    sent = 0
+    while True:
+        block = body.read(8192)
+        if not block:
+            break
+        sent += len(block)
+    return sent
+
+
+def measure(build, image):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = build(image)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed_ms, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    # Warm up JPEG and base64 code paths so the first row isn't skewed
+    warmup = Image.new("RGB", (64, 64))
+    legacy_body(warmup)
+    streamed_body(warmup)
+
+    print(f"{'crop':<5} {'upload':<8} {'method':<9} {'body':>10} {'time':>10} {'peak (Python heap)':>20}")
+    for label, size in SIZES.items():
+        source = Image.effect_noise(size, 64).convert("RGB")
+        for resize in (True, False):
+            image = prepare(source, resize)
+            for name, build in (("legacy", legacy_body), ("streamed", streamed_body)):
+                body_size, elapsed_ms, peak_mb = measure(build, image)
+                print(f"{label:<5} {'resized' if resize else 'full':<8} {name:<9} {body_size / 1024:8.0f} KB "
+                      f"{elapsed_ms:7.1f} ms {peak_mb:17.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
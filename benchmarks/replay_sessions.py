@@ -0,0 +1,219 @@
+"""Replay recorded snips through the pipeline as a performance regression test.
+
+Record real snips by starting the app with TRANSNAP_RECORD_DIR set. Every
+snip is then saved with its crop, target language, raw API responses and
+stage timings. This tool runs each recorded snip headless through the same
+code: preprocessing (tiling, resize, JPEG encode), the recorded backend's
+client with its HTTP session answering from the recording, response parsing,
+and create_text_image layout and rendering. Per-stage times (median of
+--runs) are compared against a baseline saved with --update. The run fails
+when a stage is slower than the baseline by more than its tolerance.
+
+    TRANSNAP_RECORD_DIR=~/transnap-recordings python main.py
+    python benchmarks/replay_sessions.py ~/transnap-recordings/*.zip --update
+    python benchmarks/replay_sessions.py ~/transnap-recordings/*.zip
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, ROOT)
+
+from gemini_client import GeminiTranslator
+from main import ScreenTranslatorApp
+from openai_client import OpenAICompatibleTranslator
+from session_recorder import load_archive
+from translator import StageTrace, timed
+
+STAGES = ["preprocess", "request", "parse", "render", "total"]
+
+# Recorded backend -> (client class, constructor arguments)
+BACKENDS = {
+    "gemini": (GeminiTranslator, {"api_key": "replay"}),
+    "openai": (OpenAICompatibleTranslator, {"model": "replay"}),
+}
+
+# Provider response shapes, for requests that were answered from the cache while recording
+RAW_TEMPLATES = {
+    "gemini": lambda text: {"candidates": [{"content": {"parts": [{"text": text}]}}]},
+    "openai": lambda text: {"choices": [{"message": {"content": text}}]},
+}
+
+
+class ReplayResponse:
+    status_code = 200
+
+    def __init__(self, raw):
+        self.text = json.dumps(raw)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ReplaySession:
+    """Stands in for requests.Session: reads the request body like a real send, then answers from the recording"""
+
+    def __init__(self):
+        # Set per request by the client's _dispatch, which runs on the same thread as post()
+        self.pending = threading.local()
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        while data.read(8192):
+            pass
+        return ReplayResponse(self.pending.raw)
+
+
+def replay_client(record):
+    """The recorded backend's client, answering each request with its recorded response"""
+    backend = next((r["backend"] for r in record["responses"] if r["backend"] in BACKENDS), "gemini")
+    base, kwargs = BACKENDS[backend]
+
+    class ReplayClient(base):
+        # Every replay goes through the whole pipeline: no cache, no rate limit
+        CACHE_SIZE = 0
+        _response_cache = OrderedDict()
+        rate_limiter = None
+
+        def __init__(self):
+            super().__init__(**kwargs)
+            self.session = ReplaySession()
+            self.by_key = {response["key"]: response for response in record["responses"]}
+            self.in_order = list(record["responses"])
+            self.approximate = 0
+            self.lock = threading.Lock()
+
+        def _dispatch(self, parts, system_text, schema, max_output_tokens):
+            key = self.request_key(parts, system_text, schema, max_output_tokens)
+            with self.lock:
+                response = self.by_key.get(key)
+                if response is None:
+                    # The request differs from the recorded one (e.g. changed resize or JPEG
+                    # settings): answer with the recorded responses in order
+                    response = self.in_order[min(self.approximate, len(self.in_order) - 1)]
+                    self.approximate += 1
+            self.session.pending.raw = response["raw"] or RAW_TEMPLATES[backend](response["text"])
+            return super()._dispatch(parts, system_text, schema, max_output_tokens)
+
+        def _record_usage(self, entry):
+            pass
+
+        def instruction_tokens(self, system_text):
+            return None
+
+    return ReplayClient()
+
+
+def replay_snip(image, record, renderer):
+    """Run one recorded snip; returns (stage timings in ms, digest of the rendered result, approximate matches)"""
+    client = replay_client(record)
+    trace = StageTrace()
+    start = time.perf_counter()
+    blocks = client.translate_image_blocks(image, record["target_lang"], trace=trace)
+    renderer.target_lang = record["target_lang"]
+    renderer.colors = ScreenTranslatorApp.THEMES[record.get("theme", "dark")]
+    with timed(trace, "render"):
+        rendered = renderer.create_text_image(blocks)
+    trace.add("total", time.perf_counter() - start)
+    return trace.timings_ms(), hashlib.sha256(rendered.tobytes()).hexdigest()[:16], client.approximate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archives", nargs="+", help="recorded session archives (.zip)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", help="baseline file (default: replay_baseline.json next to the first archive)")
+    parser.add_argument("--update", action="store_true", help="save this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown per stage when updating")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or os.path.join(os.path.dirname(os.path.abspath(args.archives[0])), "replay_baseline.json")
+
+    # Only the layout code of the app is used, so no Tk window is created
+    renderer = ScreenTranslatorApp.__new__(ScreenTranslatorApp)
+    # Fonts are looked up relative to the working directory; point them at the repo instead
+    renderer.resource_path = lambda relative_path: os.path.join(ROOT, relative_path)
+
+    snips = {}
+    recorded = {stage: 0.0 for stage in STAGES}
+    approximate = 0
+    for archive in args.archives:
+        for name, image, record in load_archive(archive):
+            key = f"{os.path.basename(archive)}/{name}"
+            with contextlib.redirect_stdout(io.StringIO()):
+                # One warm-up run so first-use costs (font loading, imports) aren't counted
+                replay_snip(image, record, renderer)
+                runs = [replay_snip(image, record, renderer) for _ in range(args.runs)]
+            timings = {stage: round(statistics.median(run[0].get(stage, 0.0) for run in runs), 2) for stage in STAGES}
+            snips[key] = {"timings_ms": timings, "render_digest": runs[0][1]}
+            approximate += runs[0][2]
+            for stage, ms in record["timings_ms"].items():
+                if stage in recorded:
+                    recorded[stage] += ms
+
+    if not snips:
+        sys.exit("No recorded snips found")
+
+    totals = {stage: sum(snip["timings_ms"][stage] for snip in snips.values()) for stage in STAGES}
+    print(f"Replayed {len(snips)} snips from {len(args.archives)} archive(s), median of {args.runs} runs")
+    print("Recorded live: " + ", ".join(f"{stage} {recorded[stage]:.0f} ms" for stage in STAGES[:-1]))
+    if approximate:
+        print(f"{approximate} requests had no exact recorded match and were answered in recorded order")
+
+    if args.update:
+        with open(baseline_path, 'w') as f:
+            json.dump({"tolerance": args.tolerance, "runs": args.runs, "snips": snips}, f, indent=1)
+            f.write("\n")
+        print("\n" + "\n".join(f"  {stage:<11} {totals[stage]:9.1f} ms" for stage in STAGES))
+        print(f"\nBaseline saved to {baseline_path}")
+        return
+
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    except OSError:
+        sys.exit(f"No baseline at {baseline_path}; run with --update first")
+
+    # Only snips present in both runs are compared
+    common = [key for key in snips if key in baseline["snips"]]
+    before = {stage: sum(baseline["snips"][key]["timings_ms"][stage] for key in common) for stage in STAGES}
+    after = {stage: sum(snips[key]["timings_ms"][stage] for key in common) for stage in STAGES}
+
+    print(f"\n{'stage':<11} {'baseline':>11} {'replay':>11} {'change':>8}")
+    failed = False
+    for stage in STAGES:
+        change = (after[stage] - before[stage]) / before[stage] if before[stage] else 0.0
+        flag = ""
+        # Differences under a millisecond in total are noise
+        if change > baseline["tolerance"] and after[stage] - before[stage] > 1.0:
+            flag = "  FAIL"
+            failed = True
+        print(f"{stage:<11} {before[stage]:8.1f} ms {after[stage]:8.1f} ms {change:+7.1%}{flag}")
+
+    slowest = sorted(common, key=lambda key: baseline["snips"][key]["timings_ms"]["total"] - snips[key]["timings_ms"]["total"])
+    print("\nLargest slowdowns per snip (total):")
+    for key in slowest[:5]:
+        print(f"  {key:<48} {baseline['snips'][key]['timings_ms']['total']:8.1f} -> {snips[key]['timings_ms']['total']:8.1f} ms")
+
+    changed = [key for key in common if baseline["snips"][key]["render_digest"] != snips[key]["render_digest"]]
+    if changed:
+        print(f"\nRendered output differs from the baseline for {len(changed)} snip(s), e.g. {changed[0]}")
+    missing = len(baseline["snips"]) - len(common)
+    if missing:
+        print(f"{missing} baseline snip(s) were not replayed")
+
+    if failed:
+        sys.exit(1)
+    print(f"\nAll stages within {baseline['tolerance']:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
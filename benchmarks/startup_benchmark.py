@@ -0,0 +1,165 @@
+"""Cold start benchmark for main.py (or a frozen Transnap build).
+
+Starts the app repeatedly with TRANSNAP_STARTUP_BENCHMARK set, which makes it
+write its startup timings and exit right after first paint. Fails when the
+median exceeds the budget in startup_budget.json by more than its tolerance.
+It also times a headless `import main`, which needs no display. Each budget
+only means something on the machine it was measured on, so it is recorded
+with that machine's details. A metric without a recorded budget is not
+checked: the repo ships a budget for `import main` only, and first paint
+and wall time are unchecked until someone runs --update on a desktop.
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --headless  # import time only
+    python benchmarks/startup_benchmark.py --frozen dist/Transnap.exe
+    python benchmarks/startup_benchmark.py --update   # record the current numbers as the budget
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+NOISE_MS = 5
+
+
+def run_once(command, importtime):
+    fd, result_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    env = dict(os.environ, TRANSNAP_STARTUP_BENCHMARK=result_path)
+    try:
+        start = time.perf_counter()
+        process = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+        wall_ms = (time.perf_counter() - start) * 1000
+        with open(result_path) as f:
+            result = json.load(f)
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        sys.exit(f"App did not report startup timings: {e}")
+    finally:
+        os.remove(result_path)
+
+    result["wall_ms"] = wall_ms
+    if importtime:
+        result["imports"] = parse_importtime(process.stderr)
+    return result
+
+
+def parse_importtime(stderr):
+    """Top-level modules from -X importtime output, with cumulative time in ms"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        # Only direct imports (least indented) so nested modules aren't counted twice
+        if match and len(match.group(2)) == 1:
+            modules[match.group(3)] = int(match.group(1)) / 1000
+    return modules
+
+
+def import_main_ms():
+    """Cumulative time of a headless `import main`, from -X importtime"""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=60)
+    if process.returncode:
+        sys.exit(f"import main failed:\n{process.stderr[-2000:]}")
+    return parse_importtime(process.stderr)["main"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--frozen", help="path to a built executable instead of main.py")
+    parser.add_argument("--headless", action="store_true", help="only time `import main` (no display needed)")
+    parser.add_argument("--update", action="store_true", help="write the measured medians as the new budget")
+    args = parser.parse_args()
+
+    measured = {}
+    if not args.frozen:
+        # Doesn't start Tk, so it is checked on machines without a display too
+        import_main_ms()
+        measured["import_main_ms"] = statistics.median(import_main_ms() for _ in range(args.runs))
+        print(f"import main {measured['import_main_ms']:.1f} ms (median of {args.runs})")
+
+    if not args.headless:
+        if args.frozen:
+            command = [os.path.abspath(args.frozen)]
+        else:
+            command = [sys.executable, "-X", "importtime", "main.py"]
+
+        # One warm-up run so the OS file cache doesn't skew the first measurement
+        run_once(command, False)
+        results = [run_once(command, not args.frozen) for _ in range(args.runs)]
+
+        measured["first_paint_ms"] = statistics.median(r["first_paint_ms"] for r in results)
+        measured["wall_ms"] = statistics.median(r["wall_ms"] for r in results)
+        print(f"first paint {measured['first_paint_ms']:.0f} ms, process wall time {measured['wall_ms']:.0f} ms "
+              f"(median of {args.runs})")
+
+        print("\nInitialization steps:")
+        for step in results[0]["steps"]:
+            print(f"  {step:<12} {statistics.median(r['steps'][step] for r in results):7.1f} ms")
+
+        if not args.frozen:
+            print("\nSlowest imports:")
+            imports = {name: statistics.median(r["imports"].get(name, 0) for r in results) for name in results[0]["imports"]}
+            for name, ms in sorted(imports.items(), key=lambda item: -item[1])[:10]:
+                print(f"  {name:<24} {ms:7.1f} ms")
+
+    machine = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "build": "frozen" if args.frozen else "source"
+    }
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+    budgets = budget.setdefault("budgets", {})
+
+    if args.update:
+        for key, value in measured.items():
+            budgets[key] = {"ms": round(value, 1), "runs": args.runs, "measured_on": machine,
+                            "measured_at": time.strftime("%Y-%m-%d")}
+        with open(BUDGET_PATH, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"\nBudget updated in {BUDGET_PATH}")
+        return
+
+    checked = [key for key in measured if key in budgets]
+    if not checked:
+        # Neither pass nor fail against made-up numbers
+        print(f"\nNo measured budget for {', '.join(measured)} in {BUDGET_PATH}; "
+              "run with --update on the reference machine first")
+        sys.exit(2)
+
+    print()
+    failed = False
+    for key in checked:
+        recorded = budgets[key]
+        if recorded["measured_on"] != machine:
+            print(f"Warning: the {key} budget was measured on {recorded['measured_on']}, this is {machine}")
+        limit = recorded["ms"] * (1 + budget["tolerance"])
+        # Differences of a few milliseconds are noise, whatever the tolerance
+        if measured[key] > limit and measured[key] - recorded["ms"] > NOISE_MS:
+            print(f"FAIL: {key} {measured[key]:.1f} ms exceeds budget {recorded['ms']} ms (+{budget['tolerance']:.0%})")
+            failed = True
+        else:
+            print(f"{key} {measured[key]:.1f} ms within budget {recorded['ms']} ms (+{budget['tolerance']:.0%})")
+    unchecked = [key for key in measured if key not in budgets]
+    if unchecked:
+        print(f"Not checked, no budget recorded yet: {', '.join(unchecked)}")
+    if failed:
+        sys.exit(1)
+    print("\nStartup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Latency of tall snips: one downscaled request vs parallel tiles.
+
+Pages of text lines are translated both ways against a local mock of an
+OpenAI-compatible server. Like a real vision model, the mock takes a fixed
+round trip plus a cost per line of text it has to write out, so a single
+request for a whole page pays for every line in sequence while tiles split
+that work. The mock infers the lines in each image from its height and the
+upload scale. It also reports how small the text was in what it received,
+since the single request shrinks the page to MAX_DIMENSION.
+
+    python benchmarks/tiling_benchmark.py
+    python benchmarks/tiling_benchmark.py --heights 2000 6000 --latency 0.6 --per-line 0.08
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image, ImageDraw, ImageFont
+from openai_client import OpenAICompatibleTranslator
+from translator import Translator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PAGE_WIDTH = 800
+LINE_SPACING = 28
+FONT_SIZE = 18
+
+
+def text_page(height):
+    font = ImageFont.truetype(os.path.join(ROOT, "fonts", "Vazirmatn-Regular.ttf"), FONT_SIZE)
+    image = Image.new("RGB", (PAGE_WIDTH, height), "white")
+    draw = ImageDraw.Draw(image)
+    random.seed(height)
+    for y in range(0, height - LINE_SPACING, LINE_SPACING):
+        words = " ".join("".join(random.choice("abcdefghik") for _ in range(random.randint(2, 9))) for _ in range(12))
+        draw.text((12, y), words, fill="black", font=font)
+    return image
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        url = next(part["image_url"]["url"] for part in request["messages"][-1]["content"] if part["type"] == "image_url")
+        image = Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1])))
+
+        scale = image.width / PAGE_WIDTH
+        lines = max(1, round(image.height / scale / LINE_SPACING))
+        with self.server.lock:
+            self.server.text_px.append(FONT_SIZE * scale)
+        time.sleep(self.server.latency + self.server.per_line * lines)
+
+        answer = {"paragraphs": [{"text": f"line {i}", "direction": "ltr"} for i in range(lines)]}
+        body = json.dumps({"choices": [{"message": {"content": json.dumps(answer)}}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def timed_runs(fn, runs):
+    times = []
+    for _ in range(runs):
+        Translator._response_cache.clear()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heights", type=int, nargs="+", default=[1600, 3000, 6000], help="page heights in pixels")
+    parser.add_argument("--latency", type=float, default=0.4, help="mock round trip in seconds")
+    parser.add_argument("--per-line", type=float, default=0.05, help="mock cost per line of output in seconds")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.latency = args.latency
+    server.per_line = args.per_line
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    translator = OpenAICompatibleTranslator(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", model="mock")
+    translator.rate_limiter = None
+
+    print(f"mock: {args.latency * 1000:.0f} ms + {args.per_line * 1000:.0f} ms/line, "
+          f"{FONT_SIZE} px text every {LINE_SPACING} px, {PAGE_WIDTH} px wide, median of {args.runs}")
+    print(f"{'height':>6} {'tiles':>5} {'single':>9} {'tiled':>9} {'speedup':>7} {'text px single/tiled':>21}")
+    for height in args.heights:
+        page = text_page(height)
+        tiles = len(translator.split_into_tiles(page))
+        # Keep the pipeline's per-request logging out of the table
+        with contextlib.redirect_stdout(io.StringIO()):
+            server.text_px = []
+            single = timed_runs(lambda: translator._translate_single_blocks(page, "English"), args.runs)
+            single_px = server.text_px[0]
+            server.text_px = []
+            tiled = timed_runs(lambda: translator.translate_image_blocks(page, "English"), args.runs)
+            tiled_px = min(server.text_px)
+        print(f"{height:6d} {tiles:5d} {single:6.0f} ms {tiled:6.0f} ms {single / tiled:6.1f}x "
+              f"{single_px:10.1f} / {tiled_px:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from PIL import Image, ImageGrab
+
+
+class CaptureBackend:
+    """Grabs screen pixels as a PIL image. bbox is (x1, y1, x2, y2) in screen coordinates."""
+
+    name = "base"
+
+    @classmethod
+    def is_available(cls):
+        return False
+
+    def grab(self, bbox=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PillowBackend(CaptureBackend):
+    """PIL.ImageGrab, works everywhere Pillow can grab the screen"""
+
+    name = "pillow"
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def grab(self, bbox=None):
+        return ImageGrab.grab(bbox=bbox)
+
+
+class FileBackend(CaptureBackend):
+    """Serves a fixed image (path or PIL image) as the screen, for headless runs"""
+
+    name = "file"
+    ENV_VAR = "TRANSNAP_CAPTURE_FILE"
+
+    def __init__(self, source=None):
+        source = source if source is not None else os.environ.get(self.ENV_VAR)
+        if isinstance(source, Image.Image):
+            self.image = source
+        else:
+            with Image.open(source) as img:
+                self.image = img.convert("RGB")
+
+    @classmethod
+    def is_available(cls):
+        return bool(os.environ.get(cls.ENV_VAR))
+
+    def grab(self, bbox=None):
+        if bbox:
+            return self.image.crop(bbox)
+        return self.image.copy()
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class _XImage(ctypes.Structure):
+    # Only the leading fields we read; the struct is always allocated by Xlib
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+
+class XShmBackend(CaptureBackend):
+    """X11 MIT-SHM capture: the server copies pixels straight into shared memory"""
+
+    name = "xshm"
+
+    ZPixmap = 2
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+    ALL_PLANES = 0xFFFFFFFFFFFFFFFF
+    # Shared-memory images kept for reuse: each snip size gets its own, and a
+    # full-screen one alone is tens of MB
+    MAX_IMAGES = 2
+
+    def __init__(self):
+        self.x11, self.xext, self.libc = self._load_libraries()
+        self.display = self.x11.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        if not self.xext.XShmQueryExtension(self.display):
+            self.x11.XCloseDisplay(self.display)
+            raise OSError("X server has no MIT-SHM extension")
+
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        # The root window spans every monitor
+        self.size = (self.x11.XDisplayWidth(self.display, screen), self.x11.XDisplayHeight(self.display, screen))
+        # Shared-memory images by capture size, least recently used first
+        self.images = OrderedDict()
+
+        # Xlib's default error handler exits the process, so X errors from our requests are trapped
+        self.x_errors = []
+        self.previous_handler = None
+        self.error_handler = _XErrorHandler(self._on_x_error)
+        # Displays that advertise MIT-SHM but can't share memory with us (e.g. forwarded over
+        # SSH) only fail on attach: find out now so get_backend() falls back to Pillow
+        try:
+            self.grab((0, 0, 1, 1))
+        except OSError:
+            self.close()
+            raise
+        self._free(*self.images.popitem()[1])
+
+    @classmethod
+    def is_available(cls):
+        if not sys.platform.startswith("linux") or not os.environ.get("DISPLAY"):
+            return False
+        try:
+            cls._load_libraries()
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _load_libraries():
+        names = [ctypes.util.find_library(name) for name in ("X11", "Xext", "c")]
+        if not all(names):
+            raise OSError("X11 libraries not found")
+        x11, xext, libc = (ctypes.CDLL(name) for name in names)
+
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        x11.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        return x11, xext, libc
+
+    def _shared_image(self, width, height):
+        if (width, height) in self.images:
+            self.images.move_to_end((width, height))
+            return self.images[(width, height)]
+        while len(self.images) >= self.MAX_IMAGES:
+            self._free(*self.images.popitem(last=False)[1])
+
+        shminfo = _XShmSegmentInfo()
+        ximage = self.xext.XShmCreateImage(self.display, self.visual, self.depth, self.ZPixmap,
+                                           None, ctypes.byref(shminfo), width, height)
+        if not ximage:
+            raise OSError("XShmCreateImage failed")
+        bits_per_pixel = ximage.contents.bits_per_pixel
+        if bits_per_pixel != 32:
+            self.x11.XFree(ximage)
+            raise OSError(f"Unsupported pixel format: {bits_per_pixel} bpp")
+
+        size = ximage.contents.bytes_per_line * height
+        shminfo.shmid = self.libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if shminfo.shmid < 0:
+            self.x11.XFree(ximage)
+            raise OSError("shmget failed")
+        shminfo.shmaddr = self.libc.shmat(shminfo.shmid, None, 0)
+        if shminfo.shmaddr in (None, ctypes.c_void_p(-1).value):
+            self.libc.shmctl(shminfo.shmid, self.IPC_RMID, None)
+            self.x11.XFree(ximage)
+            raise OSError("shmat failed")
+        shminfo.readOnly = 0
+        ximage.contents.data = shminfo.shmaddr
+
+        with self._trap_x_errors() as errors:
+            attached = self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+        # Segment is freed automatically once both sides detach
+        self.libc.shmctl(shminfo.shmid, self.IPC_RMID, None)
+        if not attached or errors:
+            self.libc.shmdt(shminfo.shmaddr)
+            self.x11.XFree(ximage)
+            raise OSError(f"XShmAttach failed (X error {errors[0] if errors else 'none'}); "
+                          "the X server can't share memory with this process")
+
+        self.images[(width, height)] = (ximage, shminfo, size)
+        return self.images[(width, height)]
+
+    def grab(self, bbox=None):
+        x1, y1, x2, y2 = bbox if bbox else (0, 0) + self.size
+        # Out-of-screen requests are fatal X errors, so clamp to the root window
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(self.size[0], x2), min(self.size[1], y2)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"Capture region {bbox} is outside the screen")
+        width, height = x2 - x1, y2 - y1
+        ximage, shminfo, size = self._shared_image(width, height)
+
+        with self._trap_x_errors() as errors:
+            ok = self.xext.XShmGetImage(self.display, self.root, ximage, x1, y1, self.ALL_PLANES)
+        if not ok or errors:
+            raise OSError(f"XShmGetImage failed (X error {errors[0] if errors else 'none'})")
+
+        # Decode BGRX straight from shared memory into a new RGB image (one copy)
+        buffer = (ctypes.c_char * size).from_address(shminfo.shmaddr)
+        return Image.frombuffer("RGB", (width, height), buffer, "raw", "BGRX",
+                                ximage.contents.bytes_per_line, 1)
+
+    def _on_x_error(self, display, event):
+        if display == self.display:
+            self.x_errors.append(event.contents.error_code)
+        elif self.previous_handler:
+            # Another connection in this process (Tk's): leave it to its own handler
+            return _XErrorHandler(self.previous_handler)(display, event)
+        return 0
+
+    @contextmanager
+    def _trap_x_errors(self):
+        """Collect the X error codes caused by the requests in the block instead of exiting"""
+        self.x_errors = []
+        self.previous_handler = self.x11.XSetErrorHandler(ctypes.cast(self.error_handler, ctypes.c_void_p))
+        try:
+            yield self.x_errors
+            # Errors arrive asynchronously; a round trip makes sure they have been handled
+            self.x11.XSync(self.display, 0)
+        finally:
+            self.x11.XSetErrorHandler(self.previous_handler)
+            self.previous_handler = None
+
+    def _free(self, ximage, shminfo, size):
+        self.xext.XShmDetach(self.display, ctypes.byref(shminfo))
+        self.x11.XFree(ximage)
+        self.libc.shmdt(shminfo.shmaddr)
+
+    def close(self):
+        for image in self.images.values():
+            self._free(*image)
+        self.images.clear()
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+# Fastest first; the first one that is available and initialises is used
+BACKENDS = [FileBackend, XShmBackend, PillowBackend]
+
+_backend = None
+
+
+def get_backend():
+    """Return the capture backend for this process, choosing it on first use"""
+    global _backend
+    if _backend is None:
+        for backend_class in BACKENDS:
+            if not backend_class.is_available():
+                continue
+            try:
+                _backend = backend_class()
+                break
+            except Exception as e:
+                print(f"Capture backend {backend_class.name} unavailable: {e}")
+        print(f"Using capture backend: {_backend.name}")
+    return _backend
@@ -1,10 +1,14 @@
 import os
-import requests
-import base64
-import io
-from PIL import Image
+from translator import JSONStreamBody, OutputTruncatedError, RateLimiter, TranslationError, Translator
+
+
+class GeminiTranslator(Translator):
+    name = "gemini"
+    model = "gemini-2.5-flash"
+
+    # Shared by every Gemini instance, since the quota is per API key
+    rate_limiter = RateLimiter()
 
-class GeminiTranslator:
     def __init__(self, api_key=None):
         if not api_key:
             api_key = os.environ.get("GEMINI_API_KEY")
@@ -13,59 +17,73 @@ class GeminiTranslator:
             raise ValueError("API Key is required. Please set GEMINI_API_KEY environment variable.")
             
         self.api_key = api_key
-        # Using the endpoint provided by the user for gemini-2.0-flash
-        self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={self.api_key}"
+        self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={self.api_key}"
 
-    def translate_image(self, image: Image.Image, target_lang: str = "Persian (Farsi)") -> str:
-        
-        prompt = f"You are a professional translator tasked with converting text in this image into fluent, natural {target_lang}. Extract all visible text from the image and translate it with precision, using {target_lang} idioms, formal native structures, and a refined literary tone. Preserve the original text formatting as much as possible, including paragraph structure and any visible formatting. Provide only the translated content without any additional comments or explanations."
-        try:
-            # Optimize image size and format for faster upload
-            # Resize if too large (max dimension 1024px)
-            max_dimension = 1024
-            if max(image.size) > max_dimension:
-                ratio = max_dimension / max(image.size)
-                new_size = (int(image.width * ratio), int(image.height * ratio))
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-
-            # Convert image to base64 (JPEG format for better compression)
-            buffered = io.BytesIO()
-            # Convert to RGB if necessary (JPEG doesn't support RGBA)
-            if image.mode in ('RGBA', 'P'):
-                image = image.convert('RGB')
-                
-            image.save(buffered, format="JPEG", quality=85)
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    def count_tokens(self, text):
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:countTokens?key={self.api_key}"
+        response = self.session.post(url, json={"contents": [{"parts": [{"text": text}]}]}, timeout=10)
+        response.raise_for_status()
+        return response.json()["totalTokens"]
 
-            payload = {
-                "contents": [{
-                    "parts": [
-                        {"text": prompt},
-                        {
-                            "inline_data": {
-                                "mime_type": "image/jpeg",
-                                "data": img_str
-                            }
-                        }
-                    ]
-                }]
+    def _send(self, parts, system_text, schema, max_output_tokens):
+        payload = {
+            "contents": [{
+                "parts": [self._gemini_part(part) for part in parts]
+            }]
+        }
+        if system_text:
+            payload["systemInstruction"] = {"parts": [{"text": system_text}]}
+        if schema:
+            payload["generationConfig"] = {
+                "responseMimeType": "application/json",
+                "responseSchema": self._gemini_schema(schema),
+                "thinkingConfig": {"thinkingBudget": 0}
             }
+            if max_output_tokens:
+                payload["generationConfig"]["maxOutputTokens"] = max_output_tokens
 
-            headers = {'Content-Type': 'application/json'}
-            
-            print("Sending request to Gemini API...")
-            response = requests.post(self.api_url, json=payload, headers=headers)
-            
-            if response.status_code != 200:
-                return f"Error: API returned status {response.status_code}: {response.text}"
-                
-            result = response.json()
+        headers = {'Content-Type': 'application/json'}
+        
+        print("Sending request to Gemini API...")
+        body = JSONStreamBody(payload, [part["image"] for part in parts if "image" in part])
+        response = self.session.post(self.api_url, data=body, headers=headers, timeout=self.REQUEST_TIMEOUT)
+        
+        if response.status_code != 200:
+            raise TranslationError(f"Error: API returned status {response.status_code}: {response.text}")
             
-            # Parse the response
-            try:
-                return result['candidates'][0]['content']['parts'][0]['text']
-            except (KeyError, IndexError) as e:
-                return f"Error parsing response: {result}"
+        result = response.json()
+        usage = result.get("usageMetadata", {})
+        entry = {
+            "backend": self.name,
+            "prompt": usage.get("promptTokenCount", 0),
+            "cached": usage.get("cachedContentTokenCount", 0),
+            "output": usage.get("candidatesTokenCount", 0),
+            # Kept for session recording, dropped before usage accounting
+            "raw": result
+        }
+        
+        # Cut off at maxOutputTokens: the JSON is incomplete
+        if (result.get("candidates") or [{}])[0].get("finishReason") == "MAX_TOKENS":
+            raise OutputTruncatedError()
+
+        # Parse the response
+        try:
+            return result['candidates'][0]['content']['parts'][0]['text'], entry
+        except (KeyError, IndexError) as e:
+            raise TranslationError(f"Error: could not parse the response: {result}")
+
+    @staticmethod
+    def _gemini_part(part):
+        if "image" in part:
+            image = part["image"]
+            return {"inline_data": {"mime_type": image.mime_type, "data": image.placeholder}}
+        return part
 
-        except Exception as e:
-            return f"Error during translation: {str(e)}"
+    @classmethod
+    def _gemini_schema(cls, schema):
+        # Gemini's schema dialect spells types in upper case
+        if isinstance(schema, dict):
+            return {key: value.upper() if key == "type" else cls._gemini_schema(value) for key, value in schema.items()}
+        if isinstance(schema, list):
+            return [cls._gemini_schema(value) for value in schema]
+        return schema
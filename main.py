@@ -1,18 +1,19 @@
+import time
+STARTUP_BEGIN = time.perf_counter()
+
 import tkinter as tk
 from tkinter import messagebox, scrolledtext, simpledialog, ttk
 import json
 import os
 import webbrowser
 import threading
-from snipper import Snipper
-from gemini_client import GeminiTranslator
-import pyperclip
-import keyring
 import sys
-import ctypes
-from ctypes import windll, byref, create_string_buffer, create_unicode_buffer
 import keyboard
 
+# Only what first paint and hotkey registration need is imported here.
+# PIL, requests, keyring, pyperclip, ctypes and the translator/capture modules
+# are imported where they are used, or warmed up by deferred_init after first paint.
+
 # load_dotenv() # Removed as per requirement
 
 class ScreenTranslatorApp:
@@ -54,13 +55,20 @@ class ScreenTranslatorApp:
     ]
 
     RTL_LANGUAGES = ["Farsi", "Arabic", "Hebrew", "Urdu", "Pashto", "Sindhi", "Kurdish"]
+    # How often the region is re-grabbed during a scrolling capture
+    SCROLL_POLL_MS = 150
+    # A speculative result is used if every edge of the final selection is within this many pixels
+    SPECULATION_TOLERANCE = 6
 
     def __init__(self):
+        self.startup_steps = [("imports", (time.perf_counter() - STARTUP_BEGIN) * 1000)]
+        self.last_startup_mark = time.perf_counter()
+
         self.root = tk.Tk()
         self.root.title("Transnap")
-        self.root.geometry("500x450") 
+        self.root.geometry("500x515") 
         self.root.resizable(True, True)
-        self.root.minsize(450, 400)
+        self.root.minsize(450, 465)
         
         # Set Icon
         try:
@@ -74,29 +82,166 @@ class ScreenTranslatorApp:
         self.colors = self.THEMES[self.current_theme]
         
         self.root.configure(bg=self.colors["bg"])
+        self.mark_startup("window")
         
         # Load Vazir Font
         self.font_family = "Arial" # Fallback
         self.load_custom_font("fonts/Vazirmatn-Regular.ttf", "Vazirmatn")
+        self.mark_startup("font")
 
         # Config path
         self.config_path = os.path.join(os.path.expanduser("~"), ".transnap_config.json")
         self.preferences = self.load_preferences()
         self.target_lang = self.preferences.get("language", "Farsi")
         self.shortcut = self.preferences.get("shortcut", "windows+shift+a")
+        self.repeat_shortcut = self.preferences.get("repeat_shortcut", "windows+shift+r")
+        self.scroll_shortcut = self.preferences.get("scroll_shortcut", "windows+shift+x")
+        self.last_region = self.preferences.get("last_region")
+        # Latency logging: hotkey time on the repeat path; the overlay and its build time on the normal one
+        self.snip_started_at = None
+        self.snipper = None
+        self.snip_overlay_ms = None
+        self.scroll_capture = None
+        self.use_translation_memory = self.preferences.get("translation_memory", False)
+        # Opt-in: start translating when the selection pauses, before the mouse is released
+        self.speculative_snip = self.preferences.get("speculative_snip", False)
+        self.speculation = None
+        self.speculation_stats = {"used": 0, "wasted": 0, "cancelled": 0, "saved_ms": 0.0}
+        # Opt-in session recording for replay benchmarks (see benchmarks/replay_sessions.py)
+        self.record_dir = os.environ.get("TRANSNAP_RECORD_DIR")
+        self.recorder = None
+        self.mark_startup("preferences")
 
-        # Check for API Key
-        self.api_key = self.load_config()
-        # if not self.api_key:
-        #     self.prompt_api_key() # Removed blocking prompt
+        # Loaded after first paint by deferred_init
+        self.api_key = None
+        self.api_key_loaded = threading.Event()
+        self.capture_backend = None
+        self.translation_memory = None
+        self.translator = None
+        self.translator_config = None
+        self.translation_server = None
+        self.scheduler = None
+        self.coalescer = None
+        self.lazy_lock = threading.Lock()
             
         # Register Hotkey
         try:
             keyboard.add_hotkey(self.shortcut, lambda: self.root.after(0, self.start_snip))
         except Exception as e:
             print(f"Failed to register hotkey: {e}")
+
+        # Register repeat-last-region Hotkey
+        try:
+            keyboard.add_hotkey(self.repeat_shortcut, lambda: self.root.after(0, self.repeat_last_snip))
+        except Exception as e:
+            print(f"Failed to register repeat hotkey: {e}")
+
+        # Register scrolling capture Hotkey
+        try:
+            keyboard.add_hotkey(self.scroll_shortcut, lambda: self.root.after(0, self.start_scroll_capture))
+        except Exception as e:
+            print(f"Failed to register scroll hotkey: {e}")
+        self.mark_startup("hotkeys")
         
         self.create_widgets()
+        self.mark_startup("widgets")
+
+        self.root.after_idle(self.on_first_paint)
+
+    def mark_startup(self, step):
+        now = time.perf_counter()
+        self.startup_steps.append((step, (now - self.last_startup_mark) * 1000))
+        self.last_startup_mark = now
+
+    def on_first_paint(self):
+        first_paint_ms = (time.perf_counter() - STARTUP_BEGIN) * 1000
+        steps = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.startup_steps)
+        print(f"Startup: {steps} | first paint after {first_paint_ms:.0f} ms")
+
+        # benchmarks/startup_benchmark.py sets this to a result file and expects the app to exit
+        result_path = os.environ.get("TRANSNAP_STARTUP_BENCHMARK")
+        if result_path:
+            with open(result_path, 'w') as f:
+                json.dump({"first_paint_ms": first_paint_ms, "steps": dict(self.startup_steps)}, f)
+            self.root.destroy()
+            return
+
+        threading.Thread(target=self.deferred_init, daemon=True).start()
+
+    def deferred_init(self):
+        # Everything not needed for first paint or hotkey registration
+        start = time.perf_counter()
+
+        # Check for API Key
+        api_key = self.load_config()
+        # Set here rather than on the Tk thread so a snip taken right after
+        # startup can use it; don't overwrite a key the user entered in the meantime
+        if self.api_key is None:
+            self.api_key = api_key
+        self.api_key_loaded.set()
+        self.root.after(0, self.on_api_key_loaded, api_key)
+
+        # Pick the fastest available screen capture backend and warm up the snip imports
+        self.get_capture_backend()
+        import snipper
+
+        if self.use_translation_memory:
+            self.get_translation_memory()
+
+        # Optional local API so other tools can share this translator
+        if self.preferences.get("api_server"):
+            try:
+                from translation_server import TranslationServer
+                self.translation_server = TranslationServer(self.get_translator, lambda: self.target_lang,
+                                                            self.get_scheduler(),
+                                                            port=self.preferences.get("api_server_port", 8765))
+                self.translation_server.start()
+            except Exception as e:
+                print(f"Failed to start translation server: {e}")
+
+        print(f"Deferred initialization took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def on_api_key_loaded(self, api_key):
+        if api_key and self.api_key == api_key and not self.api_entry.get():
+            self.api_entry.insert(0, api_key)
+
+    def get_capture_backend(self):
+        with self.lazy_lock:
+            if self.capture_backend is None:
+                from capture import get_backend
+                self.capture_backend = get_backend()
+            return self.capture_backend
+
+    def get_scheduler(self):
+        # Single queue in front of the translator for snips and local API requests
+        with self.lazy_lock:
+            if self.scheduler is None:
+                from scheduler import RequestScheduler
+                from gemini_client import GeminiTranslator
+                self.scheduler = RequestScheduler(rate_limiter=GeminiTranslator.rate_limiter)
+            return self.scheduler
+
+    def get_coalescer(self):
+        scheduler = self.get_scheduler()
+        with self.lazy_lock:
+            if self.coalescer is None:
+                from snip_coalescer import SnipCoalescer
+                self.coalescer = SnipCoalescer(self.get_translator, scheduler)
+            return self.coalescer
+
+    def get_recorder(self):
+        with self.lazy_lock:
+            if self.recorder is None:
+                from session_recorder import SessionRecorder
+                self.recorder = SessionRecorder(self.record_dir)
+            return self.recorder
+
+    def get_translation_memory(self):
+        with self.lazy_lock:
+            if self.translation_memory is None:
+                from translation_memory import TranslationMemory
+                self.translation_memory = TranslationMemory(os.path.join(os.path.expanduser("~"), ".transnap_memory.json"))
+            return self.translation_memory
 
     def resource_path(self, relative_path):
         """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -110,12 +255,14 @@ class ScreenTranslatorApp:
 
     def is_admin(self):
         try:
+            import ctypes
             return ctypes.windll.shell32.IsUserAnAdmin()
         except:
             return False
 
     def restart_as_admin(self):
         try:
+            import ctypes
             if sys.argv[0].endswith('.exe'):
                 # If running as exe
                 ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.argv[0], None, None, 1)
@@ -148,6 +295,7 @@ class ScreenTranslatorApp:
 
         try:
             # Load font using GDI
+            from ctypes import windll, byref, create_unicode_buffer
             FR_PRIVATE = 0x10
             FR_NOT_ENUM = 0x20
             path_buf = create_unicode_buffer(os.path.abspath(font_path))
@@ -165,6 +313,7 @@ class ScreenTranslatorApp:
 
     def load_config(self):
         try:
+            import keyring
             return keyring.get_password("Transnap", "api_key")
         except Exception as e:
             print(f"Error loading config: {e}")
@@ -172,6 +321,8 @@ class ScreenTranslatorApp:
 
     def save_config(self, api_key):
         try:
+            import keyring
+            import keyring.errors
             if api_key:
                 keyring.set_password("Transnap", "api_key", api_key)
             else:
@@ -198,11 +349,51 @@ class ScreenTranslatorApp:
         except Exception as e:
             print(f"Error saving preferences: {e}")
 
+    def get_translator(self):
+        from gemini_client import GeminiTranslator
+        from openai_client import OpenAICompatibleTranslator
+        from translation_router import RoutingTranslator
+
+        # A hotkey pressed right after startup can get here before the key is out of the keyring
+        # (runs on worker threads only, so waiting doesn't block the UI)
+        if self.api_key is None:
+            self.api_key_loaded.wait(timeout=10)
+
+        # Shared by the GUI and the translation server; rebuilt when the configuration changes
+        local_model = self.preferences.get("local_model")
+        config = (self.api_key, json.dumps(local_model, sort_keys=True))
+        if self.translator is not None and self.translator_config == config:
+            return self.translator
+
+        backends = []
+        try:
+            backends.append(GeminiTranslator(self.api_key))
+        except ValueError:
+            # A local model alone is enough
+            if not local_model:
+                raise
+        if local_model:
+            backends.append(OpenAICompatibleTranslator(**local_model))
+
+        self.translator = backends[0] if len(backends) == 1 else RoutingTranslator(backends)
+        self.translator_config = config
+        return self.translator
+
     def on_language_change(self, event=None):
         self.target_lang = self.lang_combo.get()
         self.preferences["language"] = self.target_lang
         self.save_preferences()
 
+    def on_translation_memory_toggle(self):
+        self.use_translation_memory = self.memory_var.get()
+        self.preferences["translation_memory"] = self.use_translation_memory
+        self.save_preferences()
+
+    def on_speculative_toggle(self):
+        self.speculative_snip = self.speculative_var.get()
+        self.preferences["speculative_snip"] = self.speculative_snip
+        self.save_preferences()
+
     def save_api_key_ui(self):
         key = self.api_entry.get().strip()
         if key:
@@ -254,10 +445,29 @@ class ScreenTranslatorApp:
             "3. Select an area on the screen to translate.\n\n"
             "Hotkeys:\n"
             f"• {self.shortcut}: Start Snipping\n"
-            "• Esc: Cancel Snipping"
+            f"• {self.repeat_shortcut}: Translate Last Region Again\n"
+            f"• {self.scroll_shortcut}: Scrolling Capture (select, scroll, then Done)\n"
+            "• Esc: Cancel Snipping\n\n"
+            f"Token usage: {self.usage_summary()}\n"
+            f"Speculative translation: {self.speculation_summary()}"
         )
         messagebox.showinfo("Help", help_text)
 
+    def usage_summary(self):
+        # Nothing to report if no translation module has been loaded yet
+        if "translator" not in sys.modules:
+            return "no requests yet"
+        from translator import Translator
+        return Translator.usage_summary()
+
+    def speculation_summary(self):
+        stats = self.speculation_stats
+        if not self.speculative_snip and not (stats["used"] or stats["wasted"] or stats["cancelled"]):
+            return "off"
+        saved = stats["saved_ms"] / stats["used"] if stats["used"] else 0
+        return (f"{stats['used']} used (avg {saved:.0f} ms saved), {stats['wasted']} wasted requests, "
+                f"{stats['cancelled']} cancelled before sending")
+
     def prompt_api_key(self):
         # Deprecated blocking prompt, keeping method for compatibility if needed, 
         # but logic moved to UI
@@ -361,6 +571,25 @@ class ScreenTranslatorApp:
         self.lang_combo.pack(side="left", fill="x", expand=True)
         self.lang_combo.bind("<<ComboboxSelected>>", self.on_language_change)
 
+        # Translation Memory toggle
+        self.memory_var = tk.BooleanVar(value=self.use_translation_memory)
+        memory_check = tk.Checkbutton(main_frame, text="Reuse previous translations (for scrolled text)",
+                                      variable=self.memory_var, command=self.on_translation_memory_toggle,
+                                      font=(self.font_family, 9),
+                                      bg=self.colors["bg"], fg=self.colors["fg"],
+                                      selectcolor=self.colors["text_bg"],
+                                      activebackground=self.colors["bg"], activeforeground=self.colors["fg"])
+        memory_check.pack(anchor="w")
+
+        self.speculative_var = tk.BooleanVar(value=self.speculative_snip)
+        speculative_check = tk.Checkbutton(main_frame, text="Start translating while selecting (uses extra requests)",
+                                           variable=self.speculative_var, command=self.on_speculative_toggle,
+                                           font=(self.font_family, 9),
+                                           bg=self.colors["bg"], fg=self.colors["fg"],
+                                           selectcolor=self.colors["text_bg"],
+                                           activebackground=self.colors["bg"], activeforeground=self.colors["fg"])
+        speculative_check.pack(anchor="w", pady=(0, 20))
+
         # Toolbar area
         toolbar = tk.Frame(main_frame, bg=self.colors["bg"])
         toolbar.pack(fill="x")
@@ -373,6 +602,14 @@ class ScreenTranslatorApp:
                                  relief="flat", padx=20, pady=5, cursor="hand2")
         self.new_btn.pack(side="left")
 
+        # Scrolling capture Button
+        scroll_btn = tk.Button(toolbar, text="Scroll", command=self.start_scroll_capture,
+                               font=(self.font_family, 10),
+                               bg=self.colors["btn_bg"], fg=self.colors["btn_fg"],
+                               activebackground=self.colors["btn_active"], activeforeground=self.colors["btn_fg"],
+                               relief="flat", padx=10, pady=5, cursor="hand2")
+        scroll_btn.pack(side="left", padx=(10, 0))
+
         # Theme Toggle Button
         theme_btn = tk.Button(toolbar, text="Theme", command=self.toggle_theme,
                               font=(self.font_family, 10),
@@ -400,16 +637,211 @@ class ScreenTranslatorApp:
         # That's acceptable for now, or we could track it.
 
     def start_snip(self):
+        started = time.perf_counter()
+        # The drag is the user's time, so this path is timed in two parts around it
+        self.snip_started_at = None
         self.previous_state = self.root.state()
         self.root.withdraw()
+        from snipper import Snipper
         snip_root = tk.Toplevel(self.root)
-        Snipper(snip_root, self.on_snip_complete)
+        # Speculation only covers the structured path; translation memory needs the final crop
+        speculate = self.speculative_snip and not self.use_translation_memory
+        self.snipper = Snipper(snip_root, self.on_snip_complete, self.get_capture_backend(),
+                               on_selection_stable=self.on_selection_stable if speculate else None)
+        self.snip_overlay_ms = (time.perf_counter() - started) * 1000
+        print(f"Snip overlay ready in {self.snip_overlay_ms:.1f} ms")
+
+    def repeat_last_snip(self):
+        # Without a remembered region fall back to the normal overlay
+        if not self.last_region:
+            self.start_snip()
+            return
+
+        self.snip_started_at = time.perf_counter()
+        if not (hasattr(self, 'result_window') and self.result_window.winfo_exists()):
+            self.previous_state = self.root.state()
+
+        # Hide our own windows so they don't end up in the capture
+        if hasattr(self, 'result_window') and self.result_window.winfo_exists():
+            self.result_window.destroy()
+        self.root.withdraw()
+        self.root.update()
+
+        try:
+            # Grab only the remembered bbox instead of the full desktop
+            image = self.get_capture_backend().grab(bbox=tuple(self.last_region))
+        except Exception as e:
+            print(f"Failed to grab last region: {e}")
+            self.root.deiconify()
+            return
 
-    def on_snip_complete(self, image):
+        self.on_snip_complete(image)
+
+    def start_scroll_capture(self):
+        if self.scroll_capture:
+            return
+        self.previous_state = self.root.state()
+        self.root.withdraw()
+        from snipper import Snipper
+        snip_root = tk.Toplevel(self.root)
+        Snipper(snip_root, self.on_scroll_region_selected, self.get_capture_backend())
+
+    def on_scroll_region_selected(self, image, region=None):
+        if not image:
+            self.root.deiconify()
+            return
+
+        from scroll_stitcher import ScrollStitcher
+        stitcher = ScrollStitcher()
+        stitcher.add_frame(image)
+        self.scroll_capture = {"region": region, "stitcher": stitcher, "frames": 1}
+        self.show_scroll_controls(region)
+        self.root.after(self.SCROLL_POLL_MS, self.poll_scroll_capture)
+
+    def show_scroll_controls(self, region):
+        controls = tk.Toplevel(self.root)
+        controls.overrideredirect(True)
+        controls.attributes("-topmost", True)
+        controls.configure(bg=self.colors["bg"], highlightthickness=1,
+                           highlightbackground=self.colors["accent"])
+
+        self.scroll_status = tk.Label(controls, text="Scroll the page, then click Done",
+                                      font=(self.font_family, 10),
+                                      bg=self.colors["bg"], fg=self.colors["fg"])
+        self.scroll_status.pack(side="left", padx=10, pady=5)
+
+        tk.Button(controls, text="Cancel", command=lambda: self.finish_scroll_capture(cancel=True),
+                  font=(self.font_family, 10),
+                  bg=self.colors["btn_bg"], fg=self.colors["btn_fg"],
+                  relief="flat", padx=10, cursor="hand2").pack(side="right", padx=5, pady=5)
+        tk.Button(controls, text="Done", command=self.finish_scroll_capture,
+                  font=(self.font_family, 10),
+                  bg=self.colors["accent"], fg="white",
+                  relief="flat", padx=10, cursor="hand2").pack(side="right", pady=5)
+        controls.bind("<Escape>", lambda e: self.finish_scroll_capture(cancel=True))
+
+        # Keep the controls out of the captured region: above it if there's room, else below
+        controls.update_idletasks()
+        x1, y1, x2, y2 = region
+        width, height = controls.winfo_reqwidth(), controls.winfo_reqheight()
+        y = y1 - height - 10 if y1 - height - 10 >= 0 else y2 + 10
+        controls.geometry(f"+{max(0, x2 - width)}+{y}")
+        self.scroll_controls = controls
+
+    def poll_scroll_capture(self):
+        capture = self.scroll_capture
+        if not capture:
+            return
+        try:
+            frame = self.get_capture_backend().grab(bbox=tuple(capture["region"]))
+            if capture["stitcher"].add_frame(frame):
+                capture["frames"] += 1
+                self.scroll_status.config(
+                    text=f"{capture['frames']} frames, {capture['stitcher'].height} px - click Done when finished")
+        except Exception as e:
+            print(f"Scrolling capture frame failed: {e}")
+        self.root.after(self.SCROLL_POLL_MS, self.poll_scroll_capture)
+
+    def finish_scroll_capture(self, cancel=False):
+        capture = self.scroll_capture
+        if not capture:
+            return
+        self.scroll_capture = None
+        if self.scroll_controls.winfo_exists():
+            self.scroll_controls.destroy()
+
+        image = None if cancel else capture["stitcher"].result()
+        if image:
+            print(f"Scrolling capture: {capture['frames']} frames stitched into {image.width}x{image.height}")
+        # One request for the whole page; tall images are tiled by the translator
+        self.on_snip_complete(image)
+
+    def on_selection_stable(self, image, region):
+        # The drag paused: start translating this crop before the mouse is released
+        if self.speculation and self.regions_match(self.speculation["region"], region):
+            return
+        self.cancel_speculation()
+
+        from scheduler import RequestScheduler
+        target_lang = self.target_lang
+        speculation = {"region": region, "started_at": time.perf_counter(), "done_at": None}
+        speculation["future"] = self.get_scheduler().submit(
+            lambda: self.get_translator().translate_image_blocks(image, target_lang), RequestScheduler.INTERACTIVE)
+        speculation["future"].add_done_callback(lambda done: speculation.update(done_at=time.perf_counter()))
+        self.speculation = speculation
+        print(f"Speculative request started for {region}")
+
+    def regions_match(self, a, b):
+        return all(abs(p - q) <= self.SPECULATION_TOLERANCE for p, q in zip(a, b))
+
+    def cancel_speculation(self):
+        speculation, self.speculation = self.speculation, None
+        if not speculation:
+            return
+        # A job still queued in the scheduler is dropped; one already sending is wasted
+        if speculation["future"].cancel():
+            self.speculation_stats["cancelled"] += 1
+        else:
+            self.speculation_stats["wasted"] += 1
+
+    def take_speculation(self, region):
+        """Return the speculative request's future if it covers the final region, else cancel it"""
+        speculation = self.speculation
+        if not speculation:
+            return None
+        if not region or not self.regions_match(speculation["region"], region):
+            self.cancel_speculation()
+            return None
+
+        self.speculation = None
+        # Time the request had already been running when the user let go
+        saved_ms = ((speculation["done_at"] or time.perf_counter()) - speculation["started_at"]) * 1000
+        self.speculation_stats["used"] += 1
+        self.speculation_stats["saved_ms"] += saved_ms
+        print(f"Using speculative result, {saved_ms:.0f} ms head start | {self.speculation_summary()}")
+        return speculation["future"]
+
+    def on_snip_complete(self, image, region=None):
         # self.root.deiconify() # Don't show main window yet
+        started_at, snipper = self.snip_started_at, self.snipper
+        self.snip_started_at = self.snipper = None
+        speculation = self.take_speculation(region if image else None)
+        if region:
+            self.last_region = list(region)
+            self.preferences["last_region"] = self.last_region
+            self.save_preferences()
+
         if image:
             self.show_processing_window(image)
-            threading.Thread(target=self.process_image, args=(image,)).start()
+            if started_at is not None:
+                print(f"Hotkey to request: {(time.perf_counter() - started_at) * 1000:.1f} ms")
+            elif snipper is not None and snipper.released_at is not None:
+                release_ms = (time.perf_counter() - snipper.released_at) * 1000
+                print(f"Overlay ready + release to request: {self.snip_overlay_ms:.1f} + {release_ms:.1f} = "
+                      f"{self.snip_overlay_ms + release_ms:.1f} ms")
+
+            if speculation:
+                speculation.add_done_callback(lambda done: self.process_image(done.result))
+            elif self.use_translation_memory:
+                from scheduler import RequestScheduler
+                self.get_scheduler().submit(lambda: self.process_image(
+                    lambda: self.get_translator().translate_image_incremental(
+                        image, self.target_lang, self.get_translation_memory())),
+                    RequestScheduler.INTERACTIVE)
+            elif self.record_dir:
+                # Recorded snips get a request of their own so they can be replayed one by one
+                from scheduler import RequestScheduler
+                from translator import StageTrace
+                trace = StageTrace()
+                target_lang = self.target_lang
+                self.get_scheduler().submit(lambda: self.process_image(
+                    lambda: self.get_translator().translate_image_blocks(image, target_lang, trace=trace),
+                    record=(image, target_lang, trace)),
+                    RequestScheduler.INTERACTIVE)
+            else:
+                # Snips taken in quick succession may share one request
+                future = self.get_coalescer().submit(image, self.target_lang)
+                future.add_done_callback(lambda done: self.process_image(done.result))
         else:
             self.root.deiconify() # Show if cancelled
 
@@ -520,33 +952,45 @@ class ScreenTranslatorApp:
             except Exception:
                 pass
 
-    def process_image(self, image):
+    def process_image(self, translate, record=None):
+        # translate() returns typed paragraph blocks (or text with translation memory) or raises.
+        # record is (image, target_lang, trace) when the snip is being recorded
+        from translator import TranslationError, blocks_to_text
+
         try:
-            translator = GeminiTranslator(self.api_key)
-            translated_text = translator.translate_image(image, target_lang=self.target_lang)
+            translated_text = translate()
             
             # Log the translation result to console
             print("\n" + "="*60)
             print("TRANSLATION RESULT")
             print("="*60)
-            print(translated_text)
+            print(blocks_to_text(translated_text) if isinstance(translated_text, list) else translated_text)
             print("="*60 + "\n")
             
-            self.root.after(0, self.update_result_window, translated_text)
+            self.root.after(0, self.update_result_window, translated_text, record)
+        except TranslationError as e:
+            print(f"\n[ERROR] Translation failed: {str(e)}\n")
+            self.root.after(0, self.update_result_window, str(e))
         except Exception as e:
             error_msg = f"Error: {str(e)}"
             print(f"\n[ERROR] Translation failed: {str(e)}\n")
             self.root.after(0, self.update_result_window, error_msg)
 
-    def update_result_window(self, text):
+    def update_result_window(self, content, record=None):
         if hasattr(self, 'status_label') and self.status_label.winfo_exists():
             self.status_label.config(text="Done", fg="#4CAF50")
             
             # Store text for copying
-            self.current_text = text
+            from translator import blocks_to_text
+            self.current_text = blocks_to_text(content) if isinstance(content, list) else content
             
             # Create image from text
-            img = self.create_text_image(text)
+            render_start = time.perf_counter()
+            img = self.create_text_image(content)
+            if record:
+                image, target_lang, trace = record
+                trace.add("render", time.perf_counter() - render_start)
+                self.get_recorder().add(image, target_lang, trace, self.current_theme)
             
             # Convert to PhotoImage
             from PIL import ImageTk
@@ -581,34 +1025,48 @@ class ScreenTranslatorApp:
             # Resize the window
             self.result_window.geometry(f"{window_width}x{int(window_height)}")
     
-    def create_text_image(self, text):
-        """Create an image with properly rendered RTL text and wrapping"""
-        from PIL import Image, ImageDraw, ImageFont
+    def text_to_blocks(self, text):
+        """Convert free-form (markdown-ish) text into paragraph blocks"""
         import re
+
+        # Clean markdown formatting from text
+        # Remove bold markers (**)
+        text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+        # Remove italic markers (*)
+        text = re.sub(r'\*(.+?)\*', r'\1', text)
+        # Remove other common markdown
+        text = re.sub(r'__(.+?)__', r'\1', text)
+        text = re.sub(r'_(.+?)_', r'\1', text)
+        
+        # Fix bullet points (replace * at start of lines with •)
+        text = re.sub(r'^\s*\*\s+', '• ', text, flags=re.MULTILINE)
+
+        # Free-form text has no per-paragraph direction, so guess from the target language
+        direction = "rtl" if self.target_lang in self.RTL_LANGUAGES else "ltr"
+        return [{"text": line, "direction": direction, "list_marker": ""} for line in text.split('\n')]
+
+    def create_text_image(self, content):
+        """Create an image with properly rendered RTL text and wrapping.
+
+        content is either a list of paragraph blocks or free-form text.
+        """
+        from PIL import Image, ImageDraw, ImageFont
         
         # Determine if error
-        is_error = text.startswith("Error:")
+        is_error = isinstance(content, str) and content.startswith("Error:")
         
         if is_error:
-            text_content = text.replace("Error: ", "")
+            content = content.replace("Error: ", "")
             title = "⚠ خطا"
             text_color = "#f44336"
         else:
-            text_content = text
             title = "نتیجه ترجمه"
             text_color = self.colors["text_fg"]
-        
-        # Clean markdown formatting from text
-        # Remove bold markers (**)
-        text_content = re.sub(r'\*\*(.+?)\*\*', r'\1', text_content)
-        # Remove italic markers (*)
-        text_content = re.sub(r'\*(.+?)\*', r'\1', text_content)
-        # Remove other common markdown
-        text_content = re.sub(r'__(.+?)__', r'\1', text_content)
-        text_content = re.sub(r'_(.+?)_', r'\1', text_content)
-        
-        # Fix bullet points (replace * at start of lines with •)
-        text_content = re.sub(r'^\s*\*\s+', '• ', text_content, flags=re.MULTILINE)
+
+        if isinstance(content, str):
+            blocks = self.text_to_blocks(content)
+        else:
+            blocks = content
         
         # Convert hex colors to RGB
         def hex_to_rgb(color):
@@ -661,7 +1119,7 @@ class ScreenTranslatorApp:
         
         max_text_width = width - (padding_x * 2)
         
-        # Determine text direction
+        # Determine title direction
         is_rtl = self.target_lang in self.RTL_LANGUAGES
         
         # Process Title
@@ -670,14 +1128,17 @@ class ScreenTranslatorApp:
         else:
             bidi_title = title
             
-        # Process Body Text with Wrapping
+        # Process Body Text with Wrapping, keeping each line's direction
         final_lines = []
         
-        paragraphs = text_content.split('\n')
-        
-        for paragraph in paragraphs:
+        for block in blocks:
+            paragraph = block["text"]
+            line_rtl = block.get("direction") == "rtl"
+            if block.get("list_marker"):
+                paragraph = f"{block['list_marker']} {paragraph}"
+
             if not paragraph.strip():
-                final_lines.append("")
+                final_lines.append(("", line_rtl))
                 continue
                 
             # Manual wrapping logic
@@ -696,25 +1157,25 @@ class ScreenTranslatorApp:
                 else:
                     # Line full, push it
                     if current_line:
-                        final_lines.append(' '.join(current_line))
+                        final_lines.append((' '.join(current_line), line_rtl))
                         current_line = [word]
                     else:
                         # Word itself is too long, just push it
-                        final_lines.append(word)
+                        final_lines.append((word, line_rtl))
                         current_line = []
             
             if current_line:
-                final_lines.append(' '.join(current_line))
+                final_lines.append((' '.join(current_line), line_rtl))
         
         # Apply RTL to wrapped lines if needed
         display_lines = []
-        for line in final_lines:
-            if line.strip() and has_rtl_libs and is_rtl:
+        for line, line_rtl in final_lines:
+            if line.strip() and has_rtl_libs and line_rtl:
                 reshaped = reshape(line)
                 bidi_line = get_display(reshaped)
-                display_lines.append(bidi_line)
+                display_lines.append((bidi_line, line_rtl))
             else:
-                display_lines.append(line)
+                display_lines.append((line, line_rtl))
         
         # Calculate height
         num_lines = len(display_lines)
@@ -727,12 +1188,12 @@ class ScreenTranslatorApp:
         y = padding_y
         
         # Draw Text Lines
-        for line in display_lines:
+        for line, line_rtl in display_lines:
             if line.strip():
                 bbox = draw.textbbox((0, 0), line, font=text_font)
                 text_w = bbox[2] - bbox[0]
                 
-                if is_rtl:
+                if line_rtl:
                     # Right align
                     x = width - padding_x - text_w
                 else:
@@ -746,6 +1207,7 @@ class ScreenTranslatorApp:
 
     def copy_to_clipboard(self):
         if hasattr(self, 'current_text'):
+            import pyperclip
             pyperclip.copy(self.current_text)
             messagebox.showinfo("Copied", "Text copied to clipboard!")
 
@@ -754,9 +1216,9 @@ class ScreenTranslatorApp:
 
 if __name__ == "__main__":
     try:
+        import ctypes
         ctypes.windll.shcore.SetProcessDpiAwareness(1)
     except Exception:
         pass
     app = ScreenTranslatorApp()
     app.run()
-A
\ No newline at end of file
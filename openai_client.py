@@ -0,0 +1,72 @@
+from translator import JSONStreamBody, OutputTruncatedError, TranslationError, Translator
+
+
+class OpenAICompatibleTranslator(Translator):
+    """Any server speaking the OpenAI chat completions API, e.g. a locally hosted vision model"""
+
+    name = "openai"
+
+    def __init__(self, base_url="http://127.0.0.1:8000/v1", model=None, api_key=None):
+        if not model:
+            raise ValueError("A model name is required for the OpenAI-compatible backend.")
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+
+    def cache_id(self):
+        return f"{self.name}:{self.base_url}:{self.model}"
+
+    def _send(self, parts, system_text, schema, max_output_tokens):
+        content = []
+        for part in parts:
+            if "image" in part:
+                image = part["image"]
+                content.append({"type": "image_url", "image_url": {"url": f"data:{image.mime_type};base64,{image.placeholder}"}})
+            else:
+                content.append({"type": "text", "text": part["text"]})
+
+        messages = []
+        if system_text:
+            messages.append({"role": "system", "content": system_text})
+        messages.append({"role": "user", "content": content})
+
+        payload = {"model": self.model, "messages": messages}
+        if schema:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "translation", "schema": schema}
+            }
+        if max_output_tokens:
+            payload["max_tokens"] = max_output_tokens
+
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        print(f"Sending request to {self.base_url} ({self.model})...")
+        body = JSONStreamBody(payload, [part["image"] for part in parts if "image" in part])
+        response = self.session.post(f"{self.base_url}/chat/completions", data=body, headers=headers,
+                                     timeout=self.REQUEST_TIMEOUT)
+
+        if response.status_code != 200:
+            raise TranslationError(f"Error: API returned status {response.status_code}: {response.text}")
+
+        result = response.json()
+        usage = result.get("usage") or {}
+        entry = {
+            "backend": self.name,
+            "prompt": usage.get("prompt_tokens", 0),
+            "cached": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+            "output": usage.get("completion_tokens", 0),
+            # Kept for session recording, dropped before usage accounting
+            "raw": result
+        }
+
+        # Cut off at max_tokens: the JSON is incomplete
+        if (result.get("choices") or [{}])[0].get("finish_reason") == "length":
+            raise OutputTruncatedError()
+
+        try:
+            return result['choices'][0]['message']['content'], entry
+        except (KeyError, IndexError, TypeError) as e:
+            raise TranslationError(f"Error: could not parse the response: {result}")
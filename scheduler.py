@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# (scheduler, priority) of the job running on the current worker thread
+_current = threading.local()
+
+
+class RequestScheduler:
+    """Runs translation jobs by priority on a shared pool of workers.
+
+    Interactive jobs (snips) always start first. Lower priority jobs never take
+    the workers reserved for interactive use, and wait while the rate budget is
+    nearly spent so a snip doesn't queue behind them for quota.
+    """
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+    PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+    def __init__(self, max_concurrency=4, reserved_interactive=1, rate_limiter=None, reserved_tokens=2):
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive = reserved_interactive
+        self.rate_limiter = rate_limiter
+        self.reserved_tokens = reserved_tokens
+
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = itertools.count()
+        self.running = {priority: 0 for priority in self.PRIORITY_NAMES}
+        self.completed = {priority: 0 for priority in self.PRIORITY_NAMES}
+        self.cancelled = {priority: 0 for priority in self.PRIORITY_NAMES}
+        self.waits = {priority: deque(maxlen=100) for priority in self.PRIORITY_NAMES}
+
+        for _ in range(max_concurrency):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, fn, priority=NORMAL):
+        """Queue fn() and return a Future for its result"""
+        future = Future()
+        with self.condition:
+            heapq.heappush(self.queue, (priority, next(self.sequence), time.monotonic(), fn, future))
+            self.condition.notify()
+        return future
+
+    def _can_start(self, priority):
+        if priority == self.INTERACTIVE:
+            return True
+        low_priority_running = sum(count for p, count in self.running.items() if p != self.INTERACTIVE)
+        if low_priority_running >= self.max_concurrency - self.reserved_interactive:
+            return False
+        if self.rate_limiter and self.rate_limiter.available() < self.reserved_tokens:
+            return False
+        return True
+
+    def _next_job(self):
+        # The heap head has the highest priority; if it can't start, nothing behind it can
+        while True:
+            with self.condition:
+                # Jobs cancelled while queued are dropped without taking a worker
+                while self.queue and self.queue[0][4].cancelled():
+                    self.cancelled[heapq.heappop(self.queue)[0]] += 1
+                if self.queue and self._can_start(self.queue[0][0]):
+                    priority, _, enqueued_at, fn, future = heapq.heappop(self.queue)
+                    self.running[priority] += 1
+                    return priority, enqueued_at, fn, future
+                # Re-check periodically while blocked on the rate budget
+                self.condition.wait(timeout=0.25 if self.queue else None)
+
+    def _worker(self):
+        while True:
+            priority, enqueued_at, fn, future = self._next_job()
+            # False when cancelled between leaving the queue and starting
+            started = future.set_running_or_notify_cancel()
+            wait = time.monotonic() - enqueued_at
+            if started:
+                print(f"Scheduler: {self.PRIORITY_NAMES[priority]} job started after "
+                      f"{wait * 1000:.0f} ms, {len(self.queue)} queued")
+                _current.job = (self, priority)
+                try:
+                    future.set_result(fn())
+                except Exception as e:
+                    future.set_exception(e)
+                finally:
+                    _current.job = None
+            with self.condition:
+                self.running[priority] -= 1
+                if started:
+                    self.completed[priority] += 1
+                    self.waits[priority].append(wait)
+                else:
+                    self.cancelled[priority] += 1
+                self.condition.notify_all()
+
+    def map(self, fn, items, priority, max_parallel):
+        """map() for use inside a running job, with up to max_parallel items at once.
+
+        The calling worker works through the items itself while helper jobs of the
+        same priority take the rest, so they count against the shared concurrency
+        and rate budget. Helpers that only start once everything is done are cancelled.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        pending = deque(range(len(items)))
+        errors = []
+        active = [0]
+        done = threading.Condition()
+
+        def work():
+            while True:
+                with done:
+                    if not pending or errors:
+                        return
+                    index = pending.popleft()
+                    active[0] += 1
+                try:
+                    results[index] = fn(items[index])
+                except Exception as e:
+                    with done:
+                        errors.append(e)
+                finally:
+                    with done:
+                        active[0] -= 1
+                        done.notify_all()
+
+        helpers = [self.submit(work, priority) for _ in range(min(max_parallel, len(items)) - 1)]
+        work()
+        for helper in helpers:
+            helper.cancel()
+        with done:
+            while active[0]:
+                done.wait()
+        if errors:
+            raise errors[0]
+        return results
+
+    def metrics(self):
+        """Queue depth, running jobs and recent wait times per priority class"""
+        with self.condition:
+            result = {}
+            for priority, name in self.PRIORITY_NAMES.items():
+                waits = list(self.waits[priority])
+                result[name] = {
+                    "queued": sum(1 for job in self.queue if job[0] == priority and not job[4].cancelled()),
+                    "running": self.running[priority],
+                    "completed": self.completed[priority],
+                    "cancelled": self.cancelled[priority],
+                    "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "max_wait_ms": round(max(waits) * 1000, 1) if waits else 0.0
+                }
+            return result
+
+
+def parallel_map(fn, items, max_parallel):
+    """map() with up to max_parallel items at once, results in order.
+
+    Inside a scheduler job the items run through that scheduler at the job's
+    priority (see RequestScheduler.map); elsewhere on a private thread pool.
+    """
+    job = getattr(_current, "job", None)
+    if job is not None:
+        scheduler, priority = job
+        return scheduler.map(fn, items, priority, max_parallel)
+    items = list(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(items)))) as executor:
+        return list(executor.map(fn, items))
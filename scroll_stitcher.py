@@ -0,0 +1,156 @@
+from collections import Counter
+from PIL import Image
+
+
+class ScrollStitcher:
+    """Builds one tall image from frames of the same region grabbed while scrolling.
+
+    Each frame is matched against the previous one with per-row hashes: every
+    distinctive row in the new frame votes for the scroll offset at which it
+    also appears in the previous frame, and only the rows scrolled into view
+    are appended. Rows pinned to the bottom of the view (cookie bars, chat
+    boxes) are kept out of the strips; the latest copy is kept at the end.
+    """
+
+    # Columns ignored on the right so a moving scrollbar doesn't break row matches
+    SCROLLBAR_MARGIN = 24
+    # Sample every Nth row when voting
+    ROW_STEP = 2
+    MIN_VOTES = 3
+    # Share of rows that must be unchanged for a frame to count as not scrolled
+    STILL_RATIO = 0.9
+    MAX_HEIGHT = 20000
+
+    def __init__(self):
+        self.strips = []
+        self.height = 0
+        self.previous_rows = None
+        self.frame_size = None
+        # Rows at the end of the stitched image that are the last frame's sticky footer, if known
+        self.footer_rows = 0
+
+    def row_hashes(self, frame):
+        """Hash of each row, None for blank rows (they match anywhere), and the value of each blank row"""
+        gray = frame.convert("L")
+        width = gray.width
+        if width > self.SCROLLBAR_MARGIN * 4:
+            gray = gray.crop((0, 0, width - self.SCROLLBAR_MARGIN, gray.height))
+            width = gray.width
+        data = gray.tobytes()
+
+        hashes, blanks = [], []
+        for y in range(gray.height):
+            row = data[y * width:(y + 1) * width]
+            # Uniform rows carry no position information
+            blank = row.count(row[:1]) == width
+            hashes.append(None if blank else hash(row))
+            blanks.append(row[0] if blank else None)
+        return hashes, blanks
+
+    def find_offset(self, previous, current):
+        """Rows scrolled between two frames (positive when scrolling down), None if no match"""
+        distinct = [(a, b) for a, b in zip(previous, current) if a is not None or b is not None]
+        if not distinct or sum(a == b for a, b in distinct) >= len(distinct) * self.STILL_RATIO:
+            return 0
+
+        positions = {}
+        for y, row_hash in enumerate(previous):
+            if row_hash is not None:
+                positions.setdefault(row_hash, []).append(y)
+
+        votes = Counter()
+        for y in range(0, len(current), self.ROW_STEP):
+            row_hash = current[y]
+            # Rows that repeat many times (table borders etc) would vote for everything
+            matches = positions.get(row_hash) if row_hash is not None else None
+            if matches and len(matches) <= 3:
+                for position in matches:
+                    votes[position - y] += 1
+        # Rows that stayed put are sticky headers or overlays, not the scrolled content
+        votes.pop(0, None)
+
+        if not votes:
+            return None
+        offset, count = votes.most_common(1)[0]
+        return offset if count >= self.MIN_VOTES else None
+
+    def static_bands(self, previous, current):
+        """Rows at the top and bottom that stayed put while the content scrolled (sticky headers and footers)"""
+        (previous_hashes, previous_blanks), (hashes, blanks) = previous, current
+        # Blank rows in the page's background colour could just as well be scrolled
+        # whitespace, so they never count as static
+        background = Counter(value for value in blanks if value is not None).most_common(1)
+        background = background[0][0] if background else None
+
+        def static(y):
+            return (hashes[y] == previous_hashes[y] and blanks[y] == previous_blanks[y]
+                    and not (hashes[y] is None and blanks[y] == background))
+
+        height = len(hashes)
+        top = 0
+        while top < height // 3 and static(top):
+            top += 1
+        bottom = 0
+        while bottom < height // 3 and static(height - 1 - bottom):
+            bottom += 1
+        return top, bottom
+
+    def _trim(self, rows):
+        """Drop the last rows of the stitched image"""
+        while rows > 0 and self.strips:
+            strip = self.strips.pop()
+            if strip.height > rows:
+                self.strips.append(strip.crop((0, 0, strip.width, strip.height - rows)))
+                self.height -= rows
+                return
+            self.height -= strip.height
+            rows -= strip.height
+
+    def add_frame(self, frame):
+        """Add a frame; returns the number of new rows appended"""
+        if self.frame_size is None:
+            self.frame_size = frame.size
+        elif frame.size != self.frame_size:
+            raise ValueError("All frames must have the same size")
+
+        rows = self.row_hashes(frame)
+        footer = 0
+        if self.previous_rows is None:
+            new_rows = frame.height
+        else:
+            offset = self.find_offset(self.previous_rows[0], rows[0])
+            if offset is None:
+                # Scrolled further than a whole frame: keep everything, nothing to dedupe against
+                new_rows = frame.height
+            elif offset <= 0:
+                # Not moved (or scrolled back up): nothing new
+                return 0
+            else:
+                top, footer = self.static_bands(self.previous_rows, rows)
+                # The new rows scrolled in just above the footer
+                new_rows = min(offset, frame.height - top - footer)
+
+        # Every frame is appended down to its last row, so the stitched image ends with the
+        # previous frame's footer, which covered content this frame shows above its own
+        trim = max(self.footer_rows, footer)
+        new_rows = min(new_rows, self.MAX_HEIGHT - (self.height - trim) - footer)
+        if new_rows <= 0:
+            return 0
+
+        self._trim(trim)
+        self.strips.append(frame.crop((0, frame.height - footer - new_rows, frame.width, frame.height)))
+        self.height += new_rows + footer
+        self.footer_rows = footer
+        self.previous_rows = rows
+        return new_rows
+
+    def result(self):
+        """The stitched image, or None if no frames were added"""
+        if not self.strips:
+            return None
+        image = Image.new("RGB", (self.frame_size[0], self.height))
+        y = 0
+        for strip in self.strips:
+            image.paste(strip, (0, y))
+            y += strip.height
+        return image
@@ -0,0 +1,63 @@
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from PIL import Image
+
+
+class SessionRecorder:
+    """Saves real snips into a zip archive so they can be replayed as performance tests.
+
+    Each snip is stored as snip-NNNN.png (the crop) and snip-NNNN.json with the
+    target language, the raw response of every request by request key, and
+    the stage timings. Replay with benchmarks/replay_sessions.py.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, time.strftime("transnap-session-%Y%m%d-%H%M%S.zip"))
+        self.count = 0
+        self.lock = threading.Lock()
+        print(f"Recording snips to {self.path}")
+
+    def add(self, image, target_lang, trace, theme="dark"):
+        """Store one finished snip; encoding and writing happen off the calling thread"""
+        with self.lock:
+            self.count += 1
+            name = f"snip-{self.count:04d}"
+        record = {
+            "version": self.FORMAT_VERSION,
+            "target_lang": target_lang,
+            "theme": theme,
+            "size": list(image.size),
+            "responses": trace.responses,
+            "timings_ms": trace.timings_ms(),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        threading.Thread(target=self._write, args=(name, image.copy(), record), daemon=True).start()
+
+    def _write(self, name, image, record):
+        buffered = io.BytesIO()
+        # PNG keeps the crop lossless, so replays see exactly what was sent
+        image.save(buffered, format="PNG", optimize=True)
+        try:
+            with self.lock, zipfile.ZipFile(self.path, "a", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr(f"{name}.png", buffered.getvalue(), compress_type=zipfile.ZIP_STORED)
+                archive.writestr(f"{name}.json", json.dumps(record, ensure_ascii=False, indent=1))
+        except OSError as e:
+            print(f"Failed to record snip: {e}")
+
+
+def load_archive(path):
+    """Yield (name, image, record) for every snip in a recorded session, in order"""
+    with zipfile.ZipFile(path) as archive:
+        names = sorted(name[:-len(".json")] for name in archive.namelist() if name.endswith(".json"))
+        for name in names:
+            record = json.loads(archive.read(f"{name}.json"))
+            image = Image.open(io.BytesIO(archive.read(f"{name}.png")))
+            image.load()
+            yield name, image, record
@@ -0,0 +1,85 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from scheduler import RequestScheduler
+
+
+class SnipCoalescer:
+    """Packs snips taken in quick succession into one multi-image request.
+
+    When no request is in flight a snip is sent right away. Snips arriving
+    while requests are in flight wait up to `window` seconds so they can share
+    a request, and the combined response is split back per snip.
+    """
+
+    def __init__(self, get_translator, scheduler, window=0.15, max_batch=6, priority=RequestScheduler.INTERACTIVE):
+        self.get_translator = get_translator
+        self.scheduler = scheduler
+        self.window = window
+        self.max_batch = max_batch
+        self.priority = priority
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.stats = {"snips": 0, "requests": 0}
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, image, target_lang):
+        """Queue a snip and return a Future for its list of paragraph blocks"""
+        future = Future()
+        self.queue.put((image, target_lang, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            with self.lock:
+                busy = self.in_flight > 0
+            deadline = time.monotonic() + (self.window if busy else 0)
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        try:
+            translator = self.get_translator()
+            by_lang = {}
+            for image, target_lang, future in batch:
+                by_lang.setdefault(target_lang, []).append((image, future))
+            groups = [(target_lang, snips) for target_lang, entries in by_lang.items()
+                      for snips in translator.group_requests(entries, image=lambda entry: entry[0])]
+        except Exception as e:
+            # e.g. no API key yet: fail this batch but keep serving later snips
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for target_lang, snips in groups:
+            with self.lock:
+                self.in_flight += 1
+                self.stats["snips"] += len(snips)
+                self.stats["requests"] += 1
+            if len(snips) > 1:
+                print(f"Coalescing {len(snips)} snips into one request")
+            self.scheduler.submit(lambda args=(translator, target_lang, snips): self._translate(*args), self.priority)
+
+    def _translate(self, translator, target_lang, snips):
+        try:
+            results = translator.translate_images_blocks([image for image, _ in snips], target_lang)
+        except Exception as e:
+            for _, future in snips:
+                future.set_exception(e)
+            return
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        for (_, future), blocks in zip(snips, results):
+            if isinstance(blocks, Exception):
+                future.set_exception(blocks)
+            else:
+                future.set_result(blocks)
@@ -1,18 +1,32 @@
+import time
 import tkinter as tk
-from PIL import Image, ImageTk, ImageGrab
+from PIL import Image, ImageTk
 import keyboard
+from capture import get_backend
 
 class Snipper:
-    def __init__(self, root, on_snip_complete):
+    # Speculative mode: how long the selection must stay still before it's reported,
+    # and how many times per drag
+    DWELL_MS = 300
+    MAX_SPECULATIONS = 3
+
+    def __init__(self, root, on_snip_complete, capture_backend=None, on_selection_stable=None):
         self.root = root
         self.on_snip_complete = on_snip_complete
+        # Optional: called with (cropped_image, region) when the drag pauses, so translation can start early
+        self.on_selection_stable = on_selection_stable
+        self.dwell_job = None
+        self.speculations = 0
         self.start_x = None
         self.start_y = None
         self.current_rect = None
         self.esc_hook = None
+        # When the mouse was released, for latency logging
+        self.released_at = None
         
         # Capture screen immediately
-        self.screen_image = ImageGrab.grab()
+        self.capture_backend = capture_backend or get_backend()
+        self.screen_image = self.capture_backend.grab()
         self.photo_image = ImageTk.PhotoImage(self.screen_image)
         
         # Create a "dimmed" version of the screenshot
@@ -101,6 +115,10 @@ class Snipper:
         x2 = max(self.start_x, cur_x)
         y2 = max(self.start_y, cur_y)
         
+        if self.on_selection_stable and self.speculations < self.MAX_SPECULATIONS:
+            self.cancel_dwell()
+            self.dwell_job = self.root.after(self.DWELL_MS, self.on_dwell, (x1, y1, x2, y2))
+
         if x2 - x1 > 0 and y2 - y1 > 0:
             # Crop the bright image to this area
             # Note: Creating new PhotoImages constantly is slow and leaks memory if not careful.
@@ -132,9 +150,31 @@ class Snipper:
             except Exception:
                 pass
 
+    def on_dwell(self, rect):
+        self.dwell_job = None
+        x1, y1, x2, y2 = rect
+        if x2 - x1 < 5 or y2 - y1 < 5:
+            return
+        self.speculations += 1
+        self.on_selection_stable(self.screen_image.crop(rect), self.screen_region(rect))
+
+    def cancel_dwell(self):
+        if self.dwell_job:
+            self.root.after_cancel(self.dwell_job)
+            self.dwell_job = None
+
+    def screen_region(self, rect):
+        # Selection in screen coordinates so it can be re-grabbed later
+        x1, y1, x2, y2 = rect
+        offset_x = self.root.winfo_rootx()
+        offset_y = self.root.winfo_rooty()
+        return (x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y)
+
     def on_button_release(self, event):
         if self.start_x is None or self.start_y is None:
             return
+        self.released_at = time.perf_counter()
+        self.cancel_dwell()
 
         end_x, end_y = (event.x, event.y)
         x1 = min(self.start_x, end_x)
@@ -147,6 +187,7 @@ class Snipper:
             return
 
         cropped_image = self.screen_image.crop((x1, y1, x2, y2))
+        region = self.screen_region((x1, y1, x2, y2))
         
         # Clean up hook before destroying
         if self.esc_hook:
@@ -157,10 +198,11 @@ class Snipper:
                 pass
                 
         self.root.destroy()
-        self.on_snip_complete(cropped_image)
+        self.on_snip_complete(cropped_image, region)
 
     def exit_snipper(self, event=None):
         print("Exit snipper called")
+        self.cancel_dwell()
         
         # Clean up hook
         if self.esc_hook:
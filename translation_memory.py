@@ -0,0 +1,73 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+
+
+class TranslationMemory:
+    """Persistent segment -> translation store, keyed per target language"""
+
+    MAX_ENTRIES_PER_LANGUAGE = 5000
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    @staticmethod
+    def normalize(segment):
+        # Width, whitespace and bullet differences shouldn't cause a miss. Case and
+        # punctuation can change the meaning ("US" vs "us", "?" vs "."), so they are kept
+        text = unicodedata.normalize("NFKC", segment)
+        text = re.sub(r'\s+', ' ', text).strip()
+        # A dash or asterisk is only a bullet when a space follows ("-5" is a number)
+        return re.sub(r'^(?:[·•]\s*|[-*]\s+)+', '', text)
+
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+                # Rebuilt from the exact table so keys saved with older normalization rules can't match
+                for memory in entries.values():
+                    memory["normalized"] = {self.normalize(segment): translation
+                                            for segment, translation in memory["exact"].items()}
+                return entries
+        except Exception as e:
+            print(f"Error loading translation memory: {e}")
+        return {}
+
+    def save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error saving translation memory: {e}")
+
+    def lookup(self, segment, target_lang):
+        """Return the stored translation for a segment, trying an exact match first"""
+        with self.lock:
+            memory = self.entries.get(target_lang)
+            if not memory:
+                return None
+            exact = memory["exact"].get(segment.strip())
+            if exact is not None:
+                return exact
+            return memory["normalized"].get(self.normalize(segment))
+
+    def add(self, pairs, target_lang):
+        """Store (segment, translation) pairs and persist them"""
+        with self.lock:
+            memory = self.entries.setdefault(target_lang, {"exact": {}, "normalized": {}})
+            for segment, translation in pairs:
+                memory["exact"][segment.strip()] = translation
+                memory["normalized"][self.normalize(segment)] = translation
+
+            # Drop the oldest entries once the memory grows too large
+            for key in ("exact", "normalized"):
+                table = memory[key]
+                while len(table) > self.MAX_ENTRIES_PER_LANGUAGE:
+                    del table[next(iter(table))]
+
+            self.save()
@@ -0,0 +1,73 @@
+import threading
+import time
+import requests
+from translator import OutputTruncatedError, TranslationError, Translator
+
+
+class RoutingTranslator(Translator):
+    """Sends each request to the fastest healthy backend, failing over to the next one.
+
+    Latency is a moving average of recent successful requests per backend. A backend
+    that fails is skipped until its cool-down expires.
+    """
+
+    name = "router"
+    FAILURE_COOLDOWN = 30
+    LATENCY_SMOOTHING = 0.3
+
+    def __init__(self, backends):
+        if not backends:
+            raise ValueError("At least one translation backend is required.")
+        self.backends = backends
+        self.stats = {id(backend): {"latency": None, "down_until": 0.0} for backend in backends}
+        self.stats_lock = threading.Lock()
+
+    def cache_id(self):
+        return "router:" + ",".join(backend.cache_id() for backend in self.backends)
+
+    def count_tokens(self, text):
+        return self.backends[0].count_tokens(text)
+
+    def _ranked_backends(self):
+        now = time.monotonic()
+        with self.stats_lock:
+            healthy = [b for b in self.backends if self.stats[id(b)]["down_until"] <= now]
+            # Unmeasured backends rank first (in configured order) so each gets measured
+            return sorted(healthy or self.backends, key=lambda b: self.stats[id(b)]["latency"] or 0.0)
+
+    def _dispatch(self, parts, system_text, schema, max_output_tokens):
+        last_error = None
+        for backend in self._ranked_backends():
+            start = time.perf_counter()
+            try:
+                result = backend._dispatch(parts, system_text, schema, max_output_tokens)
+            except OutputTruncatedError:
+                # The backend works, the answer just needs more room
+                raise
+            except (TranslationError, requests.RequestException) as e:
+                print(f"Backend {backend.name} failed, trying next: {e}")
+                with self.stats_lock:
+                    self.stats[id(backend)]["down_until"] = time.monotonic() + self.FAILURE_COOLDOWN
+                last_error = e
+                continue
+
+            elapsed = time.perf_counter() - start
+            with self.stats_lock:
+                stats = self.stats[id(backend)]
+                if stats["latency"] is None:
+                    stats["latency"] = elapsed
+                else:
+                    stats["latency"] += self.LATENCY_SMOOTHING * (elapsed - stats["latency"])
+                summary = self.latency_summary()
+            print(f"Routed to {backend.name} ({summary})")
+            return result
+
+        if isinstance(last_error, TranslationError):
+            raise last_error
+        raise TranslationError(f"Error: no translation backend available: {last_error}")
+
+    def latency_summary(self):
+        # Called with stats_lock held
+        return ", ".join(
+            f"{b.name} {self.stats[id(b)]['latency'] * 1000:.0f} ms" if self.stats[id(b)]["latency"] is not None
+            else f"{b.name} unmeasured" for b in self.backends)
@@ -0,0 +1,232 @@
+import base64
+import hashlib
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from PIL import Image
+
+from scheduler import RequestScheduler
+from translator import TranslationError, blocks_to_text
+
+
+class InvalidImageError(ValueError):
+    """Raised when a submitted body can't be decoded as an image"""
+
+
+class MicroBatcher:
+    """Collects submissions arriving close together and translates them in as few requests as possible.
+
+    Identical images within a batch are only translated once, and distinct
+    images with the same target language and priority share one multi-image
+    request, which is split back per image.
+    """
+
+    def __init__(self, get_translator, scheduler, window=0.05, max_batch=8):
+        self.get_translator = get_translator
+        self.scheduler = scheduler
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, image_bytes, target_lang, priority=RequestScheduler.NORMAL):
+        future = Future()
+        self.queue.put((image_bytes, target_lang, priority, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        groups = {}
+        for image_bytes, target_lang, priority, future in batch:
+            key = (hashlib.sha256(image_bytes).hexdigest(), target_lang)
+            group = groups.setdefault(key, [image_bytes, target_lang, priority, []])
+            # A duplicate runs at the most urgent priority it was submitted with
+            group[2] = min(group[2], priority)
+            group[3].append(future)
+
+        requests = {}
+        for image_bytes, target_lang, priority, futures in groups.values():
+            requests.setdefault((target_lang, priority), []).append((image_bytes, futures))
+
+        print(f"Translation server: batch of {len(batch)} ({len(groups)} unique, {len(requests)} requests)")
+        for (target_lang, priority), entries in requests.items():
+            self.scheduler.submit(lambda args=(target_lang, entries): self._translate_request(*args), priority)
+
+    def _translate_request(self, target_lang, entries):
+        images = []
+        for image_bytes, futures in entries:
+            try:
+                image = Image.open(io.BytesIO(image_bytes))
+                image.load()
+                images.append((image, futures))
+            except Exception:
+                self._fail(futures, InvalidImageError("Request body is not a supported image"))
+
+        try:
+            translator = self.get_translator()
+            requests = translator.group_requests(images, image=lambda entry: entry[0])
+        except Exception as e:
+            for _, futures in images:
+                self._fail(futures, e)
+            return
+
+        for request in requests:
+            try:
+                results = translator.translate_images_blocks([image for image, _ in request], target_lang)
+            except Exception as e:
+                for _, futures in request:
+                    self._fail(futures, e)
+                continue
+            for (_, futures), blocks in zip(request, results):
+                if isinstance(blocks, Exception):
+                    self._fail(futures, blocks)
+                    continue
+                for future in futures:
+                    future.set_result(blocks)
+
+    def _fail(self, futures, error):
+        for future in futures:
+            future.set_exception(error)
+
+
+class TranslationRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health                     -> {"status": "ok"}
+    GET  /metrics                    -> scheduler queue depth and wait times
+    POST /translate?lang=...         body: raw image bytes -> {"paragraphs": [...], "text": "..."}
+    POST /translate/batch?lang=...   body: {"images": [base64, ...]}
+                                     -> one JSON line per image, streamed as each finishes
+    """
+
+    MAX_BODY_SIZE = 64 * 1024 * 1024
+    LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+    def _is_local_request(self):
+        """Web pages can reach loopback too: browsers always send Origin on their cross-site
+        POSTs, and a DNS-rebound page still names its own host in Host"""
+        if "Origin" in self.headers:
+            return False
+        host = self.headers.get("Host", "")
+        if not host.endswith("]"):
+            host = host.rsplit(":", 1)[0]
+        return host.lower() in self.LOOPBACK_HOSTS
+
+    def do_GET(self):
+        if not self._is_local_request():
+            self._send_json(403, {"error": "Only local tools may use this server"})
+            return
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            self._send_json(200, self.server.batcher.scheduler.metrics())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._is_local_request():
+            self._send_json(403, {"error": "Only local tools may use this server"})
+            return
+        url = urlparse(self.path)
+        target_lang = parse_qs(url.query).get("lang", [None])[0] or self.server.default_lang()
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = 0
+        if length <= 0 or length > self.MAX_BODY_SIZE:
+            self._send_json(400, {"error": "Missing or too large request body"})
+            return
+        body = self.rfile.read(length)
+
+        if url.path == "/translate":
+            try:
+                blocks = self.server.batcher.submit(body, target_lang).result()
+                self._send_json(200, {"paragraphs": blocks, "text": blocks_to_text(blocks)})
+            except InvalidImageError as e:
+                self._send_json(400, {"error": str(e)})
+            except TranslationError as e:
+                self._send_json(502, {"error": str(e)})
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+        elif url.path == "/translate/batch":
+            try:
+                images = [base64.b64decode(data) for data in json.loads(body)["images"]]
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"error": "Expected {\"images\": [base64, ...]}"})
+                return
+            self._stream_batch(images, target_lang)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def _stream_batch(self, images, target_lang):
+        # Batch jobs yield to snips and single-image requests
+        futures = {self.server.batcher.submit(image, target_lang, RequestScheduler.BACKGROUND): index
+                   for index, image in enumerate(images)}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        # Results are written in completion order, each line tagged with its image index
+        done = queue.Queue()
+        for future in futures:
+            future.add_done_callback(done.put)
+        for _ in range(len(futures)):
+            future = done.get()
+            line = {"index": futures[future]}
+            try:
+                blocks = future.result()
+                line.update(paragraphs=blocks, text=blocks_to_text(blocks))
+            except Exception as e:
+                line["error"] = str(e)
+            self.wfile.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"Translation server: {format % args}")
+
+
+class TranslationServer:
+    """Local HTTP endpoint that lets other tools use the app's translator"""
+
+    def __init__(self, get_translator, get_target_lang, scheduler, host="127.0.0.1", port=8765):
+        self.httpd = ThreadingHTTPServer((host, port), TranslationRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.batcher = MicroBatcher(get_translator, scheduler)
+        self.httpd.default_lang = get_target_lang
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        host, port = self.httpd.server_address[:2]
+        print(f"Translation server listening on http://{host}:{port}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
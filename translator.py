@@ -0,0 +1,659 @@
+import requests
+import base64
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from PIL import Image, ImageFilter
+
+from scheduler import parallel_map
+
+class TranslationError(Exception):
+    """Raised with a user-facing message when a translation request fails"""
+
+
+class OutputTruncatedError(TranslationError):
+    """Raised by backends when a response stopped at the output token limit (leaving cut-off JSON)"""
+
+    def __init__(self, message="Error: the translation was too long and got cut off"):
+        super().__init__(message)
+
+
+class RateLimiter:
+    """Token bucket shared by every caller of the API (GUI and local server)"""
+
+    def __init__(self, requests_per_minute=60, burst=8):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def available(self):
+        """Tokens currently in the bucket, without taking one"""
+        with self.lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+
+def blocks_to_text(blocks):
+    """Plain text version of paragraph blocks, for copying and logging"""
+    lines = []
+    for block in blocks:
+        marker = block.get("list_marker")
+        lines.append(f"{marker} {block['text']}" if marker else block["text"])
+    return '\n'.join(lines)
+
+
+class StageTrace:
+    """Stage timings and raw responses of one snip, collected across tile threads"""
+
+    def __init__(self):
+        self.timings = {}
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def add_response(self, key, text, backend=None, raw=None):
+        # raw is the provider's JSON response, None when answered from the cache
+        with self._lock:
+            self.responses.append({"key": key, "backend": backend, "text": text, "raw": raw})
+
+    def timings_ms(self):
+        with self._lock:
+            return {stage: round(seconds * 1000, 2) for stage, seconds in self.timings.items()}
+
+
+@contextmanager
+def timed(trace, stage):
+    """Add the time spent in the block to trace under stage; a no-op when trace is None"""
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - start)
+
+
+class EncodedImage:
+    """Encoded image bytes for an upload.
+
+    The bytes are never copied: base64 is produced in small chunks while the
+    request body is being sent, and the digest stands in for the data in cache keys.
+    """
+
+    # Multiple of 3 so independently encoded chunks concatenate into valid base64
+    CHUNK_SIZE = 3 * 16384
+
+    def __init__(self, buffer: io.BytesIO, mime_type: str = "image/jpeg"):
+        self.data = buffer.getbuffer()
+        self.mime_type = mime_type
+        self.digest = hashlib.sha256(self.data).hexdigest()
+        # Backends put this in the payload where the base64 data goes
+        self.placeholder = f"@@transnap-image-{id(self)}@@"
+
+    def base64_length(self) -> int:
+        return 4 * ((len(self.data) + 2) // 3)
+
+    def base64_chunks(self):
+        for offset in range(0, len(self.data), self.CHUNK_SIZE):
+            yield base64.b64encode(self.data[offset:offset + self.CHUNK_SIZE])
+
+
+class JSONStreamBody:
+    """File-like JSON request body that splices in base64 image data while it is read.
+
+    requests sends it with a Content-Length and reads it in blocks, so the full
+    payload string never exists in memory.
+    """
+
+    PLACEHOLDER_PATTERN = re.compile(r"@@transnap-image-(\d+)@@")
+
+    def __init__(self, payload: dict, images: list):
+        by_id = {str(id(image)): image for image in images}
+        text = json.dumps(payload).encode("utf-8")
+
+        # Alternate JSON fragments and images, in payload order
+        self.pieces = []
+        position = 0
+        for match in self.PLACEHOLDER_PATTERN.finditer(text.decode("utf-8")):
+            self.pieces.append(text[position:match.start()])
+            self.pieces.append(by_id[match.group(1)])
+            position = match.end()
+        self.pieces.append(text[position:])
+
+        self.length = sum(piece.base64_length() if isinstance(piece, EncodedImage) else len(piece)
+                          for piece in self.pieces)
+        self.chunks = self._chunks()
+        self.current = b""
+        self.offset = 0
+
+    def _chunks(self):
+        for piece in self.pieces:
+            if isinstance(piece, EncodedImage):
+                yield from piece.base64_chunks()
+            else:
+                yield piece
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        out = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if self.offset >= len(self.current):
+                self.current = next(self.chunks, None)
+                self.offset = 0
+                if self.current is None:
+                    self.current = b""
+                    break
+                continue
+            end = len(self.current) if size < 0 else min(len(self.current), self.offset + remaining)
+            out.append(self.current[self.offset:end])
+            remaining -= end - self.offset
+            self.offset = end
+        return b"".join(out)
+
+
+class Translator:
+    """Provider-neutral translation pipeline.
+
+    Backends implement _send(); tiling, structured output, translation memory,
+    caching and usage accounting are shared.
+    """
+
+    name = "base"
+    model = None
+
+    # Fixed instructions, sent as a system instruction so requests carry only the image or segments.
+    # They are still billed as input tokens on every request: at ~100 tokens they are far below the
+    # minimum for implicit or explicit context caching. usage_summary() shows their share of the input.
+    SYSTEM_PROMPTS = {
+        "text": "You are a professional translator tasked with converting text in images into fluent, natural {target_lang}. Extract all visible text from the image and translate it with precision, using {target_lang} idioms, formal native structures, and a refined literary tone. Preserve the original text formatting as much as possible, including paragraph structure and any visible formatting. Provide only the translated content without any additional comments or explanations.",
+        "blocks": "You are a professional translator tasked with converting text in images into fluent, natural {target_lang}. Extract all visible text from the image and translate it with precision, using {target_lang} idioms, formal native structures, and a refined literary tone. Return one entry per paragraph, heading or list item in reading order, with plain text only (no markdown). Give each entry its text direction, and put any bullet or number in list_marker instead of the text. Use an entry with empty text for a blank line between sections.",
+        "segments": "You are a professional translator. Translate each numbered segment you are given into fluent, natural {target_lang}, using {target_lang} idioms and a refined literary tone. Keep the numbering and answer with exactly one line per segment in the form [number] translation. Provide only the translated segments without any additional comments or explanations.",
+        "multi": "You are a professional translator tasked with converting text in images into fluent, natural {target_lang}. You are given several unrelated images, each introduced by a label such as Image 1. Translate the visible text of each image separately, using {target_lang} idioms, formal native structures, and a refined literary tone. Return one entry per image with its number as index. For each image give one paragraph entry per paragraph, heading or list item in reading order, with plain text only (no markdown), its text direction, and any bullet or number in list_marker instead of the text.",
+        "extract": "Extract all visible text from the image exactly as written, without translating it. Put each line or list item on its own line and separate paragraphs with a blank line. Provide only the extracted text without any additional comments or explanations."
+    }
+
+    # Shared across instances, so the GUI and the local server use the same
+    # connection pool, response cache and usage history
+    usage_history = deque(maxlen=100)
+    _lock = threading.Lock()
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    # Per-provider request budget, None for unlimited
+    rate_limiter = None
+    CACHE_SIZE = 128
+    _response_cache = OrderedDict()
+    # (backend, instruction text) -> token count, None while being counted
+    _instruction_tokens = {}
+
+    # Images are shrunk to this size before upload
+    MAX_DIMENSION = 1024
+    # Tiling settings for very tall snips (full pages, scrolling captures)
+    TILE_OVERLAP = 48
+    MAX_PARALLEL_TILES = 4
+    GUTTER_THRESHOLD = 2
+    # Output budget for structured responses, per request
+    MAX_OUTPUT_TOKENS = 4096
+    # (connect, read) seconds: an unreachable or hung backend raises instead of blocking
+    # the worker, so the router can fail over
+    REQUEST_TIMEOUT = (5, 60)
+
+    # Schema for structured output: one entry per paragraph, heading or list item
+    PARAGRAPHS_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "paragraphs": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string"},
+                        "direction": {"type": "string", "enum": ["ltr", "rtl"]},
+                        "list_marker": {"type": "string"}
+                    },
+                    "required": ["text", "direction"]
+                }
+            }
+        },
+        "required": ["paragraphs"]
+    }
+
+    # Several snips in one request: the paragraphs of each image, by label number
+    IMAGES_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "images": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "index": {"type": "integer"},
+                        "paragraphs": PARAGRAPHS_SCHEMA["properties"]["paragraphs"]
+                    },
+                    "required": ["index", "paragraphs"]
+                }
+            }
+        },
+        "required": ["images"]
+    }
+
+    def translate_image(self, image: Image.Image, target_lang: str = "Persian (Farsi)") -> str:
+        start = time.perf_counter()
+        tiles = self.split_into_tiles(image)
+
+        if len(tiles) == 1:
+            result = self._translate_single(image, target_lang)
+            print(f"Single request translation took {(time.perf_counter() - start) * 1000:.0f} ms")
+            return result
+
+        # Translate tiles concurrently, keeping results in reading order
+        workers = min(self.MAX_PARALLEL_TILES, len(tiles))
+        results = parallel_map(lambda tile: self._translate_single(tile, target_lang), tiles, workers)
+
+        print(f"Tiled translation ({len(tiles)} tiles, {workers} parallel) took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        for result in results:
+            if result.startswith("Error"):
+                return result
+
+        return self.stitch_translations(results)
+
+    def translate_image_blocks(self, image: Image.Image, target_lang: str = "Persian (Farsi)", trace: StageTrace = None) -> list:
+        """Translate into typed paragraph blocks ({text, direction, list_marker}), raising TranslationError on failure.
+
+        A StageTrace passed as trace collects stage timings and raw responses (see session_recorder).
+        """
+        start = time.perf_counter()
+        with timed(trace, "preprocess"):
+            tiles = self.split_into_tiles(image)
+
+        # Inside a scheduler job the extra tiles are scheduler jobs too, so they share its budget
+        results = parallel_map(lambda tile: self._translate_single_blocks(tile, target_lang, trace), tiles,
+                               self.MAX_PARALLEL_TILES)
+
+        print(f"Structured translation ({len(tiles)} tiles) took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        blocks = []
+        with timed(trace, "parse"):
+            for tile_blocks in results:
+                # Drop paragraphs repeated because of tile overlap
+                duplicated = self._overlap_length([b["text"] for b in blocks], [b["text"] for b in tile_blocks])
+                blocks.extend(tile_blocks[duplicated:])
+        return blocks
+
+    def translate_images_blocks(self, images: list, target_lang: str = "Persian (Farsi)") -> list:
+        """Translate several snips in one request, returning a list of blocks per image.
+
+        If the response can't be split back per image, each image is retried in a
+        request of its own; an image whose retry fails gets its exception instead of blocks.
+        """
+        if len(images) == 1:
+            return [self.translate_image_blocks(images[0], target_lang)]
+
+        start = time.perf_counter()
+        parts = []
+        for number, image in enumerate(images, 1):
+            # The label lets the response be split back per image
+            parts.append({"text": f"Image {number}"})
+            parts.append(self._image_part(image))
+
+        text = self._generate(parts, system_text=self.system_instruction("multi", target_lang),
+                              schema=self.IMAGES_SCHEMA, max_output_tokens=self.MAX_OUTPUT_TOKENS * len(images))
+
+        results = self._split_images_response(text, len(images))
+        if results is None:
+            print(f"Could not split the combined response, translating {len(images)} images one by one")
+            return parallel_map(lambda image: self._translate_alone(image, target_lang), images, self.MAX_PARALLEL_TILES)
+
+        print(f"Combined translation ({len(images)} images) took {(time.perf_counter() - start) * 1000:.0f} ms")
+        return results
+
+    def _split_images_response(self, text: str, count: int):
+        """Blocks per image from a multi-image response, or None if it can't be matched to the images"""
+        try:
+            entries = {int(entry["index"]): self._parse_paragraphs(entry["paragraphs"])
+                       for entry in json.loads(text)["images"]}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+        # Some answers number the images from 0
+        if 0 in entries and count not in entries:
+            entries = {index + 1: blocks for index, blocks in entries.items()}
+        if any(index < 1 or index > count for index in entries):
+            return None
+        # An image without text (an icon, a blank area) often gets no entry at all
+        return [entries.get(number, []) for number in range(1, count + 1)]
+
+    def _translate_alone(self, image: Image.Image, target_lang: str):
+        try:
+            return self.translate_image_blocks(image, target_lang)
+        except TranslationError as e:
+            return e
+
+    def group_requests(self, items: list, image=lambda item: item) -> list:
+        """Split snips into lists that each go to translate_images_blocks as one request.
+
+        Tall images are tiled into requests of their own anyway, so each goes alone;
+        the rest share one request. image(item) gives the image of an item.
+        """
+        shared, requests = [], []
+        for item in items:
+            if self.needs_tiling(image(item)):
+                requests.append([item])
+            else:
+                shared.append(item)
+        if shared:
+            requests.append(shared)
+        return requests
+
+    def _tile_height(self, image: Image.Image) -> int:
+        # Tiles are roughly square so each one keeps its width after resizing
+        return max(image.width, self.MAX_DIMENSION // 2)
+
+    def needs_tiling(self, image: Image.Image) -> bool:
+        return image.height > self.MAX_DIMENSION and image.height > self._tile_height(image) * 1.5
+
+    def split_into_tiles(self, image: Image.Image) -> list:
+        """Split tall images into tiles, cutting on whitespace gutters and overlapping only where there is none"""
+        if not self.needs_tiling(image):
+            return [image]
+        tile_height = self._tile_height(image)
+
+        # Mean edge strength per row: rows close to zero are blank gutters between text lines
+        edges = image.convert("L").filter(ImageFilter.FIND_EDGES)
+        row_strength = edges.resize((1, image.height), Image.Resampling.BOX).tobytes()
+        gutter = lambda y: row_strength[y] <= self.GUTTER_THRESHOLD
+
+        tiles = []
+        top = 0
+        while top < image.height:
+            bottom = top + tile_height
+            if bottom >= image.height - tile_height // 4:
+                tiles.append(image.crop((0, top, image.width, image.height)))
+                break
+
+            # Look for the gutter nearest the target cut within the last quarter of the tile
+            cut = next((y for y in range(bottom, bottom - tile_height // 4, -1) if gutter(y)), None)
+            if cut is not None:
+                # A cut between lines splits nothing, so the next tile starts right there
+                tiles.append(image.crop((0, top, image.width, cut)))
+                top = cut
+                continue
+
+            # No gutter: the cut goes through text, so overlap the tiles and start the next one
+            # on the gutter nearest to TILE_OVERLAP above the cut, never halfway into a line
+            tiles.append(image.crop((0, top, image.width, bottom)))
+            start = bottom - self.TILE_OVERLAP
+            candidates = [y for y in range(max(top + 1, start - self.TILE_OVERLAP), bottom) if gutter(y)]
+            top = min(candidates, key=lambda y: abs(y - start)) if candidates else max(start, top + 1)
+
+        return tiles
+
+    def stitch_translations(self, results: list) -> str:
+        """Join tile translations, dropping lines repeated because of tile overlap"""
+        lines = []
+        for result in results:
+            new_lines = result.strip().split('\n')
+            duplicated = self._overlap_length(lines, [line for line in new_lines if line.strip()])
+
+            # Skip the duplicated non-empty lines at the start of the new tile
+            skipped = 0
+            while new_lines and skipped < duplicated:
+                if new_lines.pop(0).strip():
+                    skipped += 1
+
+            lines.extend(new_lines)
+
+        return '\n'.join(lines)
+
+    def _overlap_length(self, previous: list, incoming: list) -> int:
+        # Largest run of entries at the end of the text so far that starts the next tile
+        previous = [entry.strip() for entry in previous if entry.strip()]
+        incoming = [entry.strip() for entry in incoming]
+        for k in range(min(len(previous), len(incoming), 5), 0, -1):
+            if previous[-k:] == incoming[:k]:
+                return k
+        return 0
+
+    def translate_image_incremental(self, image: Image.Image, target_lang: str, memory) -> str:
+        """Translate only segments missing from the translation memory, reusing the rest"""
+        start = time.perf_counter()
+        try:
+            source_text = self.extract_text(image)
+            segments = source_text.split('\n')
+            translations = {}
+            missing = []
+            for segment in segments:
+                if not segment.strip() or segment in translations:
+                    continue
+                cached = memory.lookup(segment, target_lang)
+                if cached is not None:
+                    translations[segment] = cached
+                else:
+                    missing.append(segment)
+                    translations[segment] = None
+
+            if missing:
+                new_translations = self.translate_segments(missing, target_lang)
+                memory.add(zip(missing, new_translations), target_lang)
+                translations.update(zip(missing, new_translations))
+
+            reused = len(translations) - len(missing)
+            print(f"Translation memory: {reused} reused, {len(missing)} new segments, "
+                  f"took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+            return '\n'.join(translations[segment] if segment.strip() else segment for segment in segments)
+
+        except TranslationError as e:
+            # Fall back to translating the whole image in one go
+            print(f"Incremental translation failed, falling back: {e}")
+            return self.translate_image(image, target_lang=target_lang)
+        except Exception as e:
+            return f"Error: translation failed: {str(e)}"
+
+    def extract_text(self, image: Image.Image) -> str:
+        return self._generate([self._image_part(image)], system_text=self.system_instruction("extract"))
+
+    def translate_segments(self, segments: list, target_lang: str) -> list:
+        numbered = '\n'.join(f"[{i}] {segment.strip()}" for i, segment in enumerate(segments, 1))
+        text = self._generate([{"text": numbered}], system_text=self.system_instruction("segments", target_lang))
+
+        results = {}
+        for line in text.split('\n'):
+            match = re.match(r'^\s*\[(\d+)\]\s*(.*)$', line)
+            if match:
+                results[int(match.group(1))] = match.group(2).strip()
+
+        if any(i not in results for i in range(1, len(segments) + 1)):
+            raise TranslationError(f"Error: expected {len(segments)} translated segments, got {len(results)}")
+        return [results[i] for i in range(1, len(segments) + 1)]
+
+    def _translate_single(self, image: Image.Image, target_lang: str) -> str:
+        try:
+            return self._generate([self._image_part(image)], system_text=self.system_instruction("text", target_lang))
+        except TranslationError as e:
+            return str(e)
+        except Exception as e:
+            return f"Error: translation failed: {str(e)}"
+
+    def _translate_single_blocks(self, image: Image.Image, target_lang: str, trace: StageTrace = None) -> list:
+        with timed(trace, "preprocess"):
+            part = self._image_part(image)
+        text = self._generate([part], system_text=self.system_instruction("blocks", target_lang),
+                              schema=self.PARAGRAPHS_SCHEMA, max_output_tokens=self.MAX_OUTPUT_TOKENS, trace=trace)
+
+        with timed(trace, "parse"):
+            try:
+                return self._parse_paragraphs(json.loads(text)["paragraphs"])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise TranslationError(f"Error: could not parse the response: {text}")
+
+    def _parse_paragraphs(self, paragraphs: list) -> list:
+        return [{
+            "text": paragraph.get("text", ""),
+            "direction": "rtl" if paragraph.get("direction") == "rtl" else "ltr",
+            "list_marker": paragraph.get("list_marker", "")
+        } for paragraph in paragraphs]
+
+    def system_instruction(self, mode: str, target_lang: str = None) -> str:
+        return self.SYSTEM_PROMPTS[mode].format(target_lang=target_lang)
+
+    def count_tokens(self, text: str) -> int:
+        """Token count of text; backends with a counting endpoint override this estimate"""
+        return max(1, len(text) // 4)
+
+    def instruction_tokens(self, system_text: str):
+        """Tokens of a system instruction, or None until its count is known (counted once, off the request path)"""
+        key = (self.cache_id(), system_text)
+        with self._lock:
+            if key in self._instruction_tokens:
+                return self._instruction_tokens[key]
+            self._instruction_tokens[key] = None
+
+        def count():
+            try:
+                tokens = self.count_tokens(system_text)
+            except Exception as e:
+                print(f"Token count failed, estimating: {e}")
+                tokens = Translator.count_tokens(self, system_text)
+            with self._lock:
+                self._instruction_tokens[key] = tokens
+        threading.Thread(target=count, daemon=True).start()
+        return None
+
+    @classmethod
+    def usage_summary(cls) -> str:
+        """Input token totals for the requests made so far in this session"""
+        with cls._lock:
+            history = list(cls.usage_history)
+        prompt = sum(entry["prompt"] for entry in history)
+        cached = sum(entry["cached"] for entry in history)
+        output = sum(entry["output"] for entry in history)
+        # The instruction is resent with every request; this is what it cost, not what it saved
+        counted = [(entry, cls._instruction_tokens.get(entry.get("instruction_key"))) for entry in history]
+        counted = [(entry, tokens) for entry, tokens in counted if tokens is not None or not entry.get("instruction_key")]
+        instruction = sum(tokens or 0 for _, tokens in counted)
+        counted_prompt = sum(entry["prompt"] for entry, _ in counted)
+        share = f"{instruction / counted_prompt:.0%}" if counted_prompt else "n/a"
+        return (f"{len(history)} requests: {prompt} input tokens ({instruction} instruction, {share} of input; "
+                f"{cached} cached), {output} output tokens")
+
+    def _record_usage(self, entry: dict):
+        # entry: {"backend", "prompt", "cached", "output"} token counts, plus the instruction_key
+        # whose count (filled in by instruction_tokens) is the instruction's share of prompt
+        with self._lock:
+            self.usage_history.append(entry)
+        instruction = self._instruction_tokens.get(entry.get("instruction_key")) if entry.get("instruction_key") else 0
+        print(f"Tokens ({entry['backend']}): {entry['prompt']} input "
+              f"({'?' if instruction is None else instruction} instruction, {entry['cached']} cached), "
+              f"{entry['output']} output | session: {self.usage_summary()}")
+
+    def _image_part(self, image: Image.Image) -> dict:
+        # Optimize image size and format for faster upload
+        # Resize if too large (max dimension 1024px)
+        max_dimension = self.MAX_DIMENSION
+        if max(image.size) > max_dimension:
+            ratio = max_dimension / max(image.size)
+            new_size = (int(image.width * ratio), int(image.height * ratio))
+            image = image.resize(new_size, Image.Resampling.LANCZOS)
+
+        # Encode as JPEG for better compression; base64 happens while sending
+        buffered = io.BytesIO()
+        # Convert to RGB if necessary (JPEG doesn't support RGBA)
+        if image.mode in ('RGBA', 'P'):
+            image = image.convert('RGB')
+            
+        image.save(buffered, format="JPEG", quality=85)
+
+        return {"image": EncodedImage(buffered)}
+
+    def request_key(self, parts: list, system_text: str = None, schema: dict = None, max_output_tokens: int = None) -> str:
+        """Provider-neutral digest of a request"""
+        request = {
+            # Images are identified by digest, so the key doesn't serialize their data
+            "parts": [{"image": part["image"].digest} if "image" in part else part for part in parts],
+            "system_text": system_text,
+            "schema": schema,
+            "max_output_tokens": max_output_tokens
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _generate(self, parts: list, system_text: str = None, schema: dict = None, max_output_tokens: int = None,
+                  trace: StageTrace = None) -> str:
+        """Run one request. parts are {"text": ...} or {"image": EncodedImage} dicts."""
+        request_key = self.request_key(parts, system_text, schema, max_output_tokens)
+
+        # Identical requests (same image, mode and language) are answered from the cache
+        cache_key = f"{self.cache_id()}:{request_key}"
+        with self._lock:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self._response_cache.move_to_end(cache_key)
+        if cached is not None:
+            print(f"Using cached {self.name} response")
+            if trace:
+                trace.add_response(request_key, cached)
+            return cached
+
+        with timed(trace, "request"):
+            try:
+                text, usage = self._dispatch(parts, system_text, schema, max_output_tokens)
+            except OutputTruncatedError:
+                if max_output_tokens is None:
+                    raise
+                # Very dense snips can need more than the cap; the model's own limit is far higher
+                print(f"Response hit the {max_output_tokens} token output limit, retrying without it")
+                text, usage = self._dispatch(parts, system_text, schema, None)
+        raw = usage.pop("raw", None)
+        if system_text:
+            self.instruction_tokens(system_text)
+            usage["instruction_key"] = (self.cache_id(), system_text)
+        self._record_usage(usage)
+        if trace:
+            trace.add_response(request_key, text, usage["backend"], raw)
+
+        with self._lock:
+            self._response_cache[cache_key] = text
+            while len(self._response_cache) > self.CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+        return text
+
+    def cache_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    def _dispatch(self, parts: list, system_text: str, schema: dict, max_output_tokens: int):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        return self._send(parts, system_text, schema, max_output_tokens)
+
+    def _send(self, parts: list, system_text: str, schema: dict, max_output_tokens: int):
+        """Send one request to the provider and return (text, usage entry), raising TranslationError.
+
+        Raises OutputTruncatedError when the response stopped at max_output_tokens (None means
+        no cap). The usage entry may carry the provider's JSON response as "raw".
+        """
+        raise NotImplementedError